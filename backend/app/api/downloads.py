@@ -0,0 +1,83 @@
+from typing import Iterator, Optional, Tuple
+import os
+import re
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from ..core.config import settings
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Диапазон (start, end включительно) из заголовка Range; None - отдать файл целиком
+
+    Поддерживается один диапазон байтов; несколько диапазонов и некорректный заголовок
+    игнорируются (допускается RFC 9110), диапазон за концом файла - 416.
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Суффикс: последние N байт
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start > end and last:
+            return None
+    if start >= size or size == 0:
+        raise HTTPException(416, "Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def _iter_file(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(settings.EXPORT_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+def file_download_response(request: Request, path: str, media_type: str, filename: str) -> Response:
+    """Отдача готового файла порциями EXPORT_CHUNK_SIZE с поддержкой Range и ETag
+
+    ETag строится по размеру и времени изменения файла. If-None-Match с тем же ETag - 304,
+    Range - 206 с запрошенной частью (If-Range с другим ETag - файл целиком), что позволяет
+    докачивать прерванные загрузки.
+    """
+    stat = os.stat(path)
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename={filename}",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range.strip() == etag:
+        byte_range = _parse_range(request.headers.get("range"), stat.st_size)
+
+    if byte_range is None:
+        start, length, status_code = 0, stat.st_size, 200
+    else:
+        start, end = byte_range
+        length, status_code = end - start + 1, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    headers["Content-Length"] = str(length)
+
+    return StreamingResponse(
+        _iter_file(path, start, length),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
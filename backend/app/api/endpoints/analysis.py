@@ -1,17 +1,92 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional
 import pandas as pd
 import json
 import logging
 from ...services.excel_service import ExcelService
 from ...services.matching_service import MatchingService
-from ...models.schemas import AnalysisRequest, AnalysisResponse
+from ...services.matching_executor import matching_executor
+from ...services.analysis_pipeline import AnalysisPipeline, AnalysisInputError
+from ...services.analysis_jobs import analysis_job_manager, JobQueueFullError
+from ...models.schemas import AnalysisRequest, AnalysisResponse, AnalysisJobStatus
+from ...core.concurrency import analysis_executor
+from ...core.config import settings
+from ..uploads import spool_upload
+from ..payloads import json_bytes, trusted_json
 
 router = APIRouter()
 excel_service = ExcelService()
 matching_service = MatchingService()
+analysis_pipeline = AnalysisPipeline(excel_service, matching_service, executor=matching_executor)
 logger = logging.getLogger(__name__)
 
+async def read_analysis_inputs(
+    survey_file: UploadFile,
+    roles_file: UploadFile,
+    control_col: str,
+    operation_cols: str,
+    role_col: str,
+    uid_col: str,
+    replacements: str,
+    detach: bool = False
+) -> Dict[str, Any]:
+    """Проверка и чтение параметров анализа, результат - аргументы AnalysisPipeline.run
+
+    С detach файлы копируются во временные файлы, переживающие запрос (фоновые задачи).
+    """
+    # Валидация входных данных
+    if not survey_file or not roles_file:
+        raise HTTPException(400, "Both survey_file and roles_file are required")
+        
+    if not survey_file.filename:
+        raise HTTPException(400, "Survey file name is required")
+    if not roles_file.filename:
+        raise HTTPException(400, "Roles file name is required")
+
+    # Проверка расширений файлов
+    if not survey_file.filename.lower().endswith(('.xlsx', '.xls')):
+        raise HTTPException(400, "Survey file must be Excel format (.xlsx, .xls)")
+    if not roles_file.filename.lower().endswith(('.xlsx', '.xls')):
+        raise HTTPException(400, "Roles file must be Excel format (.xlsx, .xls)")
+
+    # Проверка размеров; файлы разбираются прямо из временных файлов загрузки
+    try:
+        survey_content = await spool_upload(survey_file, "Survey file", detach=detach)
+        roles_content = await spool_upload(roles_file, "Roles file", detach=detach)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(400, f"Error reading files: {str(e)}")
+
+    # Парсинг JSON параметров
+    try:
+        operation_cols_list = json.loads(operation_cols)
+        replacements_list = json.loads(replacements)
+    except json.JSONDecodeError as e:
+        raise HTTPException(400, f"Invalid JSON in parameters: {str(e)}")
+
+    # Проверка обязательных параметров
+    if not control_col:
+        raise HTTPException(400, "control_col is required")
+    if not role_col:
+        raise HTTPException(400, "role_col is required")
+    if not uid_col:
+        raise HTTPException(400, "uid_col is required")
+    if not operation_cols_list:
+        raise HTTPException(400, "At least one operation column is required")
+
+    return {
+        "survey_content": survey_content,
+        "roles_content": roles_content,
+        "control_col": control_col,
+        "operation_cols": operation_cols_list,
+        "role_col": role_col,
+        "uid_col": uid_col,
+        "replacements": replacements_list
+    }
+
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_data(
     survey_file: UploadFile = File(...),
@@ -26,193 +101,123 @@ async def analyze_data(
     Анализ данных и поиск сопоставлений
     """
     try:
-        # Валидация входных данных
-        if not survey_file or not roles_file:
-            raise HTTPException(400, "Both survey_file and roles_file are required")
-            
-        if not survey_file.filename:
-            raise HTTPException(400, "Survey file name is required")
-        if not roles_file.filename:
-            raise HTTPException(400, "Roles file name is required")
-
-        # Проверка расширений файлов
-        if not survey_file.filename.lower().endswith(('.xlsx', '.xls')):
-            raise HTTPException(400, "Survey file must be Excel format (.xlsx, .xls)")
-        if not roles_file.filename.lower().endswith(('.xlsx', '.xls')):
-            raise HTTPException(400, "Roles file must be Excel format (.xlsx, .xls)")
-
-        # Чтение и проверка файлов
+        params = await read_analysis_inputs(
+            survey_file, roles_file, control_col, operation_cols, role_col, uid_col, replacements
+        )
         try:
-            survey_content = await survey_file.read()
-            roles_content = await roles_file.read()
-        except Exception as e:
-            raise HTTPException(400, f"Error reading files: {str(e)}")
-
-        if len(survey_content) == 0:
-            raise HTTPException(400, "Survey file is empty")
-        if len(roles_content) == 0:
-            raise HTTPException(400, "Roles file is empty")
+            # Разбор и сопоставление - в пуле потоков, цикл событий остается свободным
+            result = await analysis_executor.run(analysis_pipeline.run, **params)
+        except AnalysisInputError as e:
+            raise HTTPException(400, str(e))
 
-        # Парсинг JSON параметров
-        try:
-            operation_cols_list = json.loads(operation_cols)
-            replacements_list = json.loads(replacements)
-        except json.JSONDecodeError as e:
-            raise HTTPException(400, f"Invalid JSON in parameters: {str(e)}")
-
-        # Проверка обязательных параметров
-        if not control_col:
-            raise HTTPException(400, "control_col is required")
-        if not role_col:
-            raise HTTPException(400, "role_col is required")
-        if not uid_col:
-            raise HTTPException(400, "uid_col is required")
-        if not operation_cols_list:
-            raise HTTPException(400, "At least one operation column is required")
-
-        # Загрузка Excel файлов
-        try:
-            survey_sheets = excel_service.load_excel_sheets(survey_content)
-            roles_sheets = excel_service.load_excel_sheets(roles_content)
-        except Exception as e:
-            logger.error(f"Excel loading error: {e}")
-            raise HTTPException(400, f"Invalid Excel file format: {str(e)}")
-
-        if not survey_sheets:
-            raise HTTPException(400, "No sheets found in survey file")
-        if not roles_sheets:
-            raise HTTPException(400, "No sheets found in roles file")
-
-        # Выбор первых листов
-        survey_df = list(survey_sheets.values())[0]
-        roles_df = list(roles_sheets.values())[0]
-
-        # Проверка существования колонок
-        if control_col not in survey_df.columns:
-            raise HTTPException(400, f"Column '{control_col}' not found in survey file")
-        if role_col not in roles_df.columns:
-            raise HTTPException(400, f"Column '{role_col}' not found in roles file")
-        if uid_col not in roles_df.columns:
-            raise HTTPException(400, f"Column '{uid_col}' not found in roles file")
-            
-        for op_col in operation_cols_list:
-            if op_col not in survey_df.columns:
-                raise HTTPException(400, f"Operation column '{op_col}' not found in survey file")
-
-        # Применение замен к данным
-        cols_to_process = [control_col] + operation_cols_list
-        for col in cols_to_process:
-            if col in survey_df.columns:
-                survey_df[col] = survey_df[col].astype(str).replace('nan', '')
-                survey_df[col] = survey_df[col].apply(
-                    lambda x: excel_service.apply_replacements(x, replacements_list)
-                )
-
-        # Сбор уникальных значений
-        unique_control = set()
-        unique_operation = set()
-        unique_iv = set()
-
-        for _, row in survey_df.iterrows():
-            control_val = row[control_col]
-            if pd.notna(control_val) and str(control_val).strip():
-                unique_control.add(str(control_val).strip())
-            
-            for col in operation_cols_list:
-                op_vals = excel_service.split_values(row[col])
-                for val in op_vals:
-                    if excel_service.is_iv_role(val):
-                        unique_iv.add(excel_service.extract_iv_base(val))
-                    else:
-                        unique_operation.add(val)
-
-        # Создание словаря ролей
-        roles_dict = {}
-        tu_roles = []
-        tv_roles = []
-        iv_roles = []
-        
-        for _, row in roles_df.dropna(subset=[role_col]).iterrows():
-            role_name = str(row[role_col]).strip()
-            uid = str(row[uid_col]).strip()
-            roles_dict[role_name] = uid
-            
-            if role_name.startswith("ТУ "):
-                tu_roles.append(role_name)
-            elif role_name.startswith("ТВ "):
-                tv_roles.append(role_name)
-            elif role_name.startswith("ИВ "):
-                iv_roles.append(role_name)
-
-        # Анализ сопоставлений
-        pending_matches = {"TU": [], "TV": [], "IV": []}
-        auto_matches = {"TU": [], "TV": [], "IV": []}
-
-        # ТУ анализ
-        for val in unique_control:
-            role_name = f"ТУ {val}"
-            if role_name in roles_dict:
-                auto_matches["TU"].append({
-                    "original": val,
-                    "matched": role_name,
-                    "uid": roles_dict[role_name],
-                    "type": "exact"
-                })
-            else:
-                matches = matching_service.find_similar_matches(val, "TU", tu_roles)
-                if matches:
-                    pending_matches["TU"].append({
-                        "original": val,
-                        "candidates": [{"role_name": m[0], "score": m[1]} for m in matches]
-                    })
-
-        # ТВ анализ
-        for val in unique_operation:
-            role_name = f"ТВ {val}"
-            if role_name in roles_dict:
-                auto_matches["TV"].append({
-                    "original": val,
-                    "matched": role_name,
-                    "uid": roles_dict[role_name],
-                    "type": "exact"
-                })
-            else:
-                matches = matching_service.find_similar_matches(val, "TV", tv_roles)
-                if matches:
-                    pending_matches["TV"].append({
-                        "original": val,
-                        "candidates": [{"role_name": m[0], "score": m[1]} for m in matches]
-                    })
-
-        # ИВ анализ
-        for val in unique_iv:
-            role_name = f"ИВ {val}"
-            if role_name in roles_dict:
-                auto_matches["IV"].append({
-                    "original": val,
-                    "matched": role_name,
-                    "uid": roles_dict[role_name],
-                    "type": "exact"
-                })
-            else:
-                matches = matching_service.find_similar_matches(val, "IV", iv_roles)
-                if matches:
-                    pending_matches["IV"].append({
-                        "original": val,
-                        "candidates": [{"role_name": m[0], "score": m[1]} for m in matches]
-                    })
-
-        return AnalysisResponse(
-            unique_tu=list(unique_control),
-            unique_tv=list(unique_operation),
-            unique_iv=list(unique_iv),
-            pending_matches=pending_matches,
-            auto_matches=auto_matches
-        )
+        return trusted_json(result)
 
     except HTTPException:
         # Пробрасываем HTTPException как есть
         raise
     except Exception as e:
         logger.error(f"Unexpected error in analyze_data: {e}")
-        raise HTTPException(500, f"Internal server error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(500, f"Internal server error: {str(e)}")
+
+def _encode_record(record: Dict[str, Any], stream_format: str) -> bytes:
+    payload = json_bytes(record)
+    if stream_format == "sse":
+        return f"event: {record['type']}\ndata: ".encode("utf-8") + payload + b"\n\n"
+    return payload + b"\n"
+
+async def _encode_records(first: Dict[str, Any], records: AsyncGenerator[Dict[str, Any], None],
+                          stream_format: str) -> AsyncIterator[bytes]:
+    # Генератор анализа закрывается и место в пуле освобождается при любом завершении тела ответа
+    try:
+        yield _encode_record(first, stream_format)
+        async for record in records:
+            yield _encode_record(record, stream_format)
+    finally:
+        await records.aclose()
+
+@router.post("/analyze/stream")
+async def analyze_data_stream(
+    survey_file: UploadFile = File(...),
+    roles_file: UploadFile = File(...),
+    control_col: str = Form(...),
+    operation_cols: str = Form(...),
+    role_col: str = Form(...),
+    uid_col: str = Form(...),
+    replacements: str = Form("[]"),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$")
+):
+    """
+    Потоковый анализ: записи отдаются по мере готовности (NDJSON или server-sent events)
+
+    Порядок записей: unique_values, auto_matches, pending_matches (частями по мере
+    нечеткого поиска), summary. Ошибки входных данных возвращаются обычным ответом 400.
+    """
+    params = await read_analysis_inputs(
+        survey_file, roles_file, control_col, operation_cols, role_col, uid_col, replacements
+    )
+    # Весь поток занимает одно место в пуле анализа
+    records = analysis_executor.iterate(
+        analysis_pipeline.iter_results(**params), analysis_executor.reserve()
+    )
+    try:
+        # Загрузка и проверка колонок выполняются до начала потока; при ошибке iterate
+        # уже закрыл генератор и освободил место
+        first = await records.__anext__()
+    except AnalysisInputError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error in analyze_data_stream: {e}")
+        raise HTTPException(500, f"Internal server error: {str(e)}")
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        _encode_records(first, records, format),
+        media_type=media_type,
+        # Если тело ответа не начало выполняться (обрыв до первой записи); повторное закрытие безопасно
+        background=BackgroundTask(records.aclose)
+    )
+
+@router.post("/analyze/jobs", response_model=AnalysisJobStatus, status_code=202)
+async def submit_analysis_job(
+    survey_file: UploadFile = File(...),
+    roles_file: UploadFile = File(...),
+    control_col: str = Form(...),
+    operation_cols: str = Form(...),
+    role_col: str = Form(...),
+    uid_col: str = Form(...),
+    replacements: str = Form("[]")
+):
+    """
+    Постановка анализа в фоновую очередь
+
+    Возвращает job_id; ход выполнения и результат - GET /analyze/jobs/{job_id}
+    """
+    params = await read_analysis_inputs(
+        survey_file, roles_file, control_col, operation_cols, role_col, uid_col, replacements, detach=True
+    )
+    try:
+        return analysis_job_manager.submit(**params)
+    except JobQueueFullError as e:
+        params["survey_content"].close()
+        params["roles_content"].close()
+        raise HTTPException(429, str(e), headers={"Retry-After": str(settings.BUSY_RETRY_AFTER_SECONDS)})
+
+@router.get("/analyze/jobs/{job_id}", response_model=AnalysisJobStatus)
+async def get_analysis_job(job_id: str):
+    """
+    Статус задачи анализа: этап, прогресс по этапам, результат или ошибка
+    """
+    job = analysis_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Analysis job '{job_id}' not found")
+    return trusted_json(job)
+
+@router.delete("/analyze/jobs/{job_id}", response_model=AnalysisJobStatus)
+async def cancel_analysis_job(job_id: str):
+    """
+    Отмена задачи анализа
+    """
+    job = analysis_job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(404, f"Analysis job '{job_id}' not found")
+    return job
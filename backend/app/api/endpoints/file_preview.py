@@ -1,17 +1,47 @@
 # app/api/endpoints/file_preview.py
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
 import pandas as pd
 from io import BytesIO
+import json
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional, Union
+from ...services.excel_service import ExcelService
+from ...core.config import settings
+from ...core.concurrency import preview_executor
+from ...services.excel_service import ExcelSource
+from ..uploads import spool_upload
+from ..payloads import TableLayout, arrow_response, table_fields, to_arrow_ipc, trusted_json
 
 router = APIRouter()
+excel_service = ExcelService()
 logger = logging.getLogger(__name__)
 
+def _build_preview(content: ExcelSource, rows: int, layout: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        sheets = {}
+        
+        for sheet_name, info in excel_service.sniff_workbook(content, rows).items():
+            sheets[sheet_name] = {
+                "columns": info["columns"],
+                **table_fields(info["sample"], layout, "preview_data"),
+                "total_rows": info["total_rows"],
+                "total_rows_exact": info["total_rows_exact"]
+            }
+            
+    except Exception as e:
+        raise HTTPException(400, f"Invalid Excel file: {str(e)}")
+    return sheets
+
 @router.post("/file-preview")
-async def get_file_preview(file: UploadFile = File(...)):
+async def get_file_preview(
+    file: UploadFile = File(...),
+    rows: int = Query(settings.PREVIEW_ROWS, ge=0, le=settings.SHEET_DATA_MAX_LIMIT),
+    layout: Literal["records", "columns"] = Query("records")
+):
     """
-    Предпросмотр структуры Excel файла (ВСЕ данные)
+    Предпросмотр структуры Excel файла: заголовки и первые rows строк каждого листа
+
+    layout=columns - строки листа массивами значений (rows) вместо объектов (preview_data).
     """
     try:
         # Валидация файла
@@ -21,31 +51,16 @@ async def get_file_preview(file: UploadFile = File(...)):
         if not file.filename.lower().endswith(('.xlsx', '.xls')):
             raise HTTPException(400, "File must be Excel format (.xlsx, .xls)")
 
-        # Чтение файла
-        content = await file.read()
-        if len(content) == 0:
-            raise HTTPException(400, "File is empty")
+        # Файл разбирается из временного файла загрузки, без копии в памяти
+        content = await spool_upload(file)
 
-        # Загрузка Excel (ВСЕ данные, без ограничения)
-        try:
-            xls = pd.ExcelFile(BytesIO(content))
-            sheets = {}
-            
-            for sheet_name in xls.sheet_names:
-                # ЗАГРУЖАЕМ ВСЕ ДАННЫЕ, без nrows
-                df = pd.read_excel(xls, sheet_name=sheet_name)
-                sheets[sheet_name] = {
-                    "columns": df.columns.tolist(),
-                    "preview_data": df.fillna('').astype(str).to_dict('records')
-                }
-                
-        except Exception as e:
-            raise HTTPException(400, f"Invalid Excel file: {str(e)}")
-
-        return {
+        # Потоковое чтение заголовков и первых строк, листы целиком не разбираются
+        sheets = await preview_executor.run(_build_preview, content, rows, layout)
+
+        return trusted_json({
             "sheet_names": list(sheets.keys()),
             "sheets": sheets
-        }
+        })
 
     except HTTPException:
         raise
@@ -53,10 +68,74 @@ async def get_file_preview(file: UploadFile = File(...)):
         logger.error(f"File preview error: {e}")
         raise HTTPException(500, f"Internal server error: {str(e)}")
 
+def _sheet_page(content: ExcelSource, sheet_name: str, offset: int, limit: int, columns: Optional[List[str]],
+                search: Optional[str], filters: Dict[str, Any], sort_by: Optional[str],
+                sort_desc: bool, layout: TableLayout) -> Union[Dict[str, Any], bytes]:
+    # Загрузка конкретного листа через кэш разобранных листов (вместе с индексами)
+    try:
+        content_hash = excel_service.content_hash(content)
+        available_sheets = excel_service.get_sheet_names(content, content_hash)
+        
+        if sheet_name not in available_sheets:
+            raise HTTPException(400, f"Sheet '{sheet_name}' not found. Available sheets: {available_sheets}")
+            
+        sheet_index = excel_service.load_sheet_index(content, sheet_name, content_hash)
+        df = sheet_index.frame
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(400, f"Error reading sheet: {str(e)}")
+
+    requested = list(columns or []) + list(filters) + ([sort_by] if sort_by else [])
+    missing = [col for col in requested if col not in df.columns]
+    if missing:
+        raise HTTPException(400, f"Columns not found in sheet '{sheet_name}': {missing}")
+
+    rows = sheet_index.query(
+        search=search,
+        search_columns=columns,
+        filters=filters,
+        sort_by=sort_by,
+        descending=sort_desc
+    )
+    page = df.iloc[rows[offset:offset + limit]]
+    if columns:
+        page = page[columns]
+
+    meta = {
+        "total_rows": len(rows),
+        "sheet_rows": len(df),
+        "offset": offset,
+        "limit": limit
+    }
+    if layout == "arrow":
+        return to_arrow_ipc(page, meta)
+    return {"columns": page.columns.tolist(), **table_fields(page, layout, "preview_data"), **meta}
+
 @router.post("/sheet-data")
-async def get_sheet_data(file: UploadFile = File(...), sheet_name: str = "Лист1"):
+async def get_sheet_data(
+    file: UploadFile = File(...),
+    sheet_name: str = "Лист1",
+    offset: int = Query(0, ge=0),
+    limit: int = Query(settings.SHEET_DATA_DEFAULT_LIMIT, ge=1, le=settings.SHEET_DATA_MAX_LIMIT),
+    columns: Optional[List[str]] = Query(None),
+    search: Optional[str] = Query(None),
+    filters: Optional[str] = Query(None),
+    sort_by: Optional[str] = Query(None),
+    sort_desc: bool = Query(False),
+    layout: TableLayout = Query("records")
+):
     """
-    Получение данных конкретного листа (ВСЕ данные)
+    Получение страницы данных конкретного листа
+
+    offset/limit задают диапазон строк, columns - набор колонок (по умолчанию все).
+    search - поиск подстроки без учета регистра по выбранным колонкам,
+    filters - JSON-объект {"колонка": "значение" | ["значение", ...]},
+    sort_by/sort_desc - сортировка. Условия вычисляются на сервере по кэшированному
+    листу. total_rows - число строк, удовлетворяющих условиям, sheet_rows - всего в листе.
+    layout - представление страницы: records (preview_data), columns (columns + rows)
+    или arrow (Arrow IPC, остальные поля - в метаданных схемы).
     """
     try:
         # Валидация
@@ -66,30 +145,24 @@ async def get_sheet_data(file: UploadFile = File(...), sheet_name: str = "Лис
         if not file.filename.lower().endswith(('.xlsx', '.xls')):
             raise HTTPException(400, "File must be Excel format (.xlsx, .xls)")
 
-        # Чтение файла
-        content = await file.read()
-        if len(content) == 0:
-            raise HTTPException(400, "File is empty")
+        # Файл разбирается из временного файла загрузки, без копии в памяти
+        content = await spool_upload(file)
 
-        # Загрузка конкретного листа (ВСЕ данные)
         try:
-            xls = pd.ExcelFile(BytesIO(content))
-            
-            if sheet_name not in xls.sheet_names:
-                available_sheets = xls.sheet_names
-                raise HTTPException(400, f"Sheet '{sheet_name}' not found. Available sheets: {available_sheets}")
-                
-            # ЗАГРУЖАЕМ ВСЕ ДАННЫЕ, без nrows
-            df = pd.read_excel(xls, sheet_name=sheet_name)
-            df = df.fillna('')  # Заменяем NaN на пустые строки
-            
-        except Exception as e:
-            raise HTTPException(400, f"Error reading sheet: {str(e)}")
+            filters_dict = json.loads(filters) if filters else {}
+        except json.JSONDecodeError as e:
+            raise HTTPException(400, f"Invalid JSON in filters: {str(e)}")
+        if not isinstance(filters_dict, dict):
+            raise HTTPException(400, "filters must be a JSON object")
+        for column, allowed in filters_dict.items():
+            if not (isinstance(allowed, str) or
+                    (isinstance(allowed, list) and all(isinstance(value, str) for value in allowed))):
+                raise HTTPException(400, f"Filter for column '{column}' must be a string or a list of strings")
 
-        return {
-            "columns": df.columns.tolist(),
-            "preview_data": df.astype(str).to_dict('records')
-        }
+        page = await preview_executor.run(
+            _sheet_page, content, sheet_name, offset, limit, columns, search, filters_dict, sort_by, sort_desc, layout
+        )
+        return arrow_response(page) if layout == "arrow" else trusted_json(page)
 
     except HTTPException:
         raise
@@ -1,81 +1,140 @@
 # app/api/endpoints/processing.py - ОБНОВЛЕННАЯ ВЕРСИЯ
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from typing import Literal, Optional, Union
+from fastapi import APIRouter, HTTPException, Query, Request
 from ...models.schemas import ProcessRequest
 from ...services.excel_service import ExcelService
 from ...services.export_service import ExportService
+from ...services.analysis_pipeline import AnalysisPipeline
+from ...services.analysis_store import analysis_store
+from ...services.processing_service import ProcessingService
+from ...services.result_store import result_store
+from ...core.concurrency import export_executor
+from ..downloads import file_download_response
+from ..payloads import TableLayout, arrow_response, table_fields, to_arrow_ipc, trusted_json
 import pandas as pd
-from io import BytesIO
 import logging
+import uuid
 
 router = APIRouter()
 excel_service = ExcelService()
 export_service = ExportService()
+processing_service = ProcessingService()
 logger = logging.getLogger(__name__)
 
+# Форматы выгрузки результата: тип содержимого и запись сохраненного результата в файл
+RESULT_FORMATS = {
+    "xlsx": (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        lambda stored, output: export_service.write_result_excel(stored["data"], stored["highlight_rows"], output)
+    ),
+    "csv": ("text/csv; charset=utf-8", lambda stored, output: export_service.write_result_csv(stored["data"], output)),
+    "parquet": (
+        "application/vnd.apache.parquet",
+        lambda stored, output: export_service.write_result_parquet(stored["data"], output)
+    ),
+}
+
+def _process(process_id: str, analysis_id: str, context: dict, analysis_data: dict, user_choices: dict,
+             layout: TableLayout) -> Union[dict, bytes, None]:
+    """Итог по сохраненному контексту анализа, сохраняется в хранилище результатов
+
+    Для layout=arrow возвращается Arrow IPC. None - таблицы анализа устарели.
+    """
+    survey_cols = [context["control_col"]] + context["operation_cols"]
+    # Лист опроса целиком: итог - все колонки строк опроса с добавленными колонками ролей
+    survey_df = analysis_store.get_table(analysis_id, "survey")
+    roles_df = analysis_store.get_table(analysis_id, "roles")
+    if survey_df is None or roles_df is None:
+        return None
+
+    survey_df = AnalysisPipeline.prepare_survey(survey_df, survey_cols, context["replacements"])
+    roles_dict, _ = excel_service.build_roles_dict(roles_df, context["role_col"], context["uid_col"])
+    result = processing_service.process(
+        survey_df, context["control_col"], context["operation_cols"],
+        roles_dict, analysis_data, user_choices
+    )
+    df = result.pop("data")
+    result_store.put(process_id, df, result)
+    result["process_id"] = process_id
+    if layout == "arrow":
+        return to_arrow_ipc(df, result)
+    return {**table_fields(df, layout, "data"), **result}
+
 @router.post("/process")
-async def process_data(request: ProcessRequest):
+async def process_data(request: ProcessRequest, layout: TableLayout = Query("records")):
     """
     Финальная обработка данных с учетом выбранных пользователем сопоставлений
+
+    Строки опроса берутся из хранилища анализов по analysis_id из результата /analyze; итоговая
+    таблица - все колонки листа опроса и колонки ТУ_роли, ТВ_роли, ИВ_роли, Сводка_роли.
+    layout - представление итоговой таблицы: records (data), columns (columns + rows)
+    или arrow (Arrow IPC, остальные поля - в метаданных схемы).
     """
     try:
         logger.info("Starting data processing with user choices")
-        
-        # Временная реализация - нужно перенести логику из Streamlit
-        # Сейчас возвращаем структуру как в Streamlit для совместимости с фронтендом
-        
-        result_data = {
-            "data": [
-                {"Управление": "Объект 1", "ТУ_роли": "ТУ Объект 1", "Сводка_роли": "UID001"},
-                {"Управление": "Объект 2", "ТУ_роли": "ТУ Объект 2", "Сводка_роли": "UID002"}
-            ],
-            "highlight_rows": [1],  # Индексы строк для подсветки
-            "tu_summary": {
-                "Объект 1": {"role_name": "ТУ Объект 1", "found": True, "uid": "UID001", "match_type": "exact"},
-                "Объект 2": {"role_name": "ТУ Объект 2", "found": True, "uid": "UID002", "match_type": "exact"}
-            },
-            "tv_summary": {},
-            "iv_summary": {},
-            "process_id": f"proc_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}"
-        }
-        
+
+        analysis_id = request.analysis_data.get("analysis_id")
+        if not analysis_id:
+            raise HTTPException(400, "analysis_data.analysis_id is required, run /analyze first")
+        context = analysis_store.get(str(analysis_id))
+        if context is None:
+            raise HTTPException(410, "Analysis has expired, run /analyze again")
+
+        process_id = f"proc_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        result_data = await export_executor.run(
+            _process, process_id, str(analysis_id), context, request.analysis_data, request.user_choices, layout
+        )
+        if result_data is None:
+            raise HTTPException(410, "Analysis files have expired, run /analyze again")
+
         logger.info("Data processing completed successfully")
-        return result_data
-        
+        if layout == "arrow":
+            return arrow_response(result_data)
+        return trusted_json(result_data)
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Processing error: {e}")
         raise HTTPException(500, f"Processing error: {str(e)}")
 
+def _result_file(process_id: str, format: str) -> Optional[str]:
+    """Путь к выгрузке результата: собранной ранее или записанной сейчас; None - результата нет"""
+    name = f"result.{format}"
+    path = result_store.file_path(process_id, name)
+    if path is not None:
+        return path
+    stored = result_store.get(process_id)
+    if stored is None:
+        return None
+    write = RESULT_FORMATS[format][1]
+    return result_store.put_file(process_id, name, lambda output: write(stored, output))
+
 @router.get("/download-result")
-async def download_result(process_id: str):
+async def download_result(process_id: str, request: Request,
+                          format: Literal["xlsx", "csv", "parquet"] = Query("xlsx")):
     """
-    Скачивание результата в Excel
+    Скачивание результата в Excel, CSV или Parquet
+
+    Файл каждого формата собирается один раз и хранится рядом с результатом, повторные
+    загрузки (и докачка через Range) читают готовый файл. Подсветка строк есть только в xlsx.
     """
     try:
-        logger.info(f"Downloading result for process: {process_id}")
-        
-        # Временная реализация - создаем тестовый Excel
-        df = pd.DataFrame({
-            "Управление": ["Объект 1", "Объект 2"],
-            "ТУ_роли": ["ТУ Объект 1", "ТУ Объект 2"],
-            "Сводка_роли": ["UID001", "UID002"]
-        })
-        
-        # Используем существующий сервис экспорта
-        excel_data = export_service.create_result_excel(
-            df=df,
-            highlight_rows=[1],
-            tu_summary={},
-            tv_summary={}, 
-            iv_summary={}
-        )
-        
-        return StreamingResponse(
-            BytesIO(excel_data),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename=result_{process_id}.xlsx"}
+        logger.info(f"Downloading result for process: {process_id} ({format})")
+
+        # Результат сохранен /process (любым процессом uvicorn); запись файла - в пуле потоков экспорта
+        path = await export_executor.run(_result_file, process_id, format)
+        if path is None:
+            raise HTTPException(404, f"Result {process_id} not found or expired, run /process again")
+
+        return file_download_response(
+            request, path,
+            media_type=RESULT_FORMATS[format][0],
+            filename=f"result_{process_id}.{format}"
         )
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Download error: {e}")
-        raise HTTPException(500, f"Download error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(500, f"Download error: {str(e)}")
@@ -0,0 +1,64 @@
+from typing import Any, Dict, Literal
+import json
+import pandas as pd
+from fastapi import HTTPException
+from fastapi.responses import Response
+from ..core.config import settings
+from ..services.excel_service import ExcelService
+
+try:
+    import pyarrow as pa
+except ImportError:  # без pyarrow формат arrow недоступен
+    pa = None
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:  # без orjson - стандартная сериализация
+    orjson = None
+    from fastapi.responses import JSONResponse as FastJSONResponse
+
+# records - список объектов {колонка: значение}, columns - columns + rows (массивы значений),
+# arrow - Arrow IPC stream, остальные поля ответа - JSON в метаданных схемы (ключ "meta")
+TableLayout = Literal["records", "columns", "arrow"]
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+def table_fields(df: pd.DataFrame, layout: TableLayout, key: str) -> Dict[str, Any]:
+    """Поля JSON-ответа с таблицей: key со списком объектов или columns + rows"""
+    if layout == "columns":
+        return {"columns": [str(column) for column in df.columns], "rows": ExcelService.to_rows(df)}
+    return {key: ExcelService.to_records(df)}
+
+def to_arrow_ipc(df: pd.DataFrame, meta: Dict[str, Any]) -> bytes:
+    """Таблица в формате Arrow IPC stream; пустые ячейки - null, значения - строки"""
+    if pa is None:
+        raise HTTPException(400, "Arrow layout requires pyarrow on the server")
+    values = df.astype(str).where(df.notna(), None)
+    values.columns = [str(column) for column in df.columns]
+    table = pa.Table.from_pandas(values, preserve_index=False)
+    table = table.replace_schema_metadata({"meta": json.dumps(meta, ensure_ascii=False)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def arrow_response(content: bytes) -> Response:
+    return Response(content, media_type=ARROW_MEDIA_TYPE)
+
+def json_bytes(content: Any) -> bytes:
+    """JSON в UTF-8 (orjson, если установлен) - для потоковых ответов"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False).encode("utf-8")
+
+def trusted_json(content: Any) -> Any:
+    """Ответ из данных, собранных сервером: без jsonable_encoder и проверки response_model
+
+    При VALIDATE_TRUSTED_RESPONSES данные возвращаются как есть и проходят обычную
+    обработку FastAPI (проверка по response_model).
+    """
+    if settings.VALIDATE_TRUSTED_RESPONSES:
+        return content
+    return FastJSONResponse(content)
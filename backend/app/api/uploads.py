@@ -0,0 +1,46 @@
+from typing import BinaryIO
+import os
+import shutil
+import tempfile
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from ..core.config import settings
+from ..services.excel_service import ExcelService
+
+def _check_upload(handle: BinaryIO, label: str) -> BinaryIO:
+    handle.seek(0, os.SEEK_END)
+    size = handle.tell()
+    handle.seek(0)
+    if size == 0:
+        raise HTTPException(400, f"{label} is empty")
+    if size > settings.UPLOAD_MAX_BYTES:
+        raise HTTPException(413, f"{label} is too large: {size} bytes (limit {settings.UPLOAD_MAX_BYTES})")
+
+    # Оценка памяти до разбора: распакованный объем по оглавлению zip
+    archive = ExcelService.inspect_archive(handle)
+    if archive is not None and archive["uncompressed"] > settings.UPLOAD_MAX_UNCOMPRESSED_BYTES:
+        raise HTTPException(
+            413,
+            f"{label} is too large when unpacked: {archive['uncompressed']} bytes "
+            f"(limit {settings.UPLOAD_MAX_UNCOMPRESSED_BYTES})"
+        )
+    return handle
+
+def _copy_upload(handle: BinaryIO) -> BinaryIO:
+    spooled = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_MAX_BYTES)
+    shutil.copyfileobj(handle, spooled, 1024 * 1024)
+    spooled.seek(0)
+    return spooled
+
+async def spool_upload(file: UploadFile, label: str = "File", detach: bool = False) -> BinaryIO:
+    """Загруженный файл как файловый объект без чтения содержимого в память
+
+    Тело загрузки уже лежит во временном файле (starlette), разбор идет прямо из него.
+    Пустой файл - 400, превышение UPLOAD_MAX_BYTES или распакованного объема
+    UPLOAD_MAX_UNCOMPRESSED_BYTES - 413. С detach возвращается собственная копия,
+    переживающая запрос (для фоновых задач), ее закрывает получатель.
+    """
+    handle = await run_in_threadpool(_check_upload, file.file, label)
+    if detach:
+        handle = await run_in_threadpool(_copy_upload, handle)
+    return handle
@@ -0,0 +1,162 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+import asyncio
+import logging
+import threading
+from fastapi import HTTPException
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+class ServerBusyError(HTTPException):
+    """Все слоты класса запросов заняты - ответ 503 с Retry-After"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(
+            503,
+            f"Server is busy with {name} requests, retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class Reservation:
+    """Допуск запроса в BoundedExecutor; release() можно вызывать повторно"""
+
+    def __init__(self, executor: "BoundedExecutor"):
+        self._executor = executor
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._executor._release()
+
+    def __enter__(self) -> "Reservation":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class BoundedExecutor:
+    """Пул потоков для тяжелых этапов одного класса эндпоинтов.
+
+    Разбор Excel, сопоставление и экспорт выполняются вне цикла событий, поэтому
+    /health и остальные запросы воркера не ждут их завершения. Одновременно
+    выполняется не больше max_workers задач, ждать допускается не больше max_queued
+    запросам - следующие сразу получают 503 с Retry-After вместо бесконечной очереди.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queued: int, retry_after: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max(0, max_queued)
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{name}-cpu")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def reserve(self) -> Reservation:
+        """Допуск запроса: ServerBusyError, если заняты все рабочие места и очередь"""
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queued:
+                self.rejected += 1
+                logger.warning(f"Пул {self.name} перегружен: {self.in_flight} запросов, отказ")
+                raise ServerBusyError(self.name, self.retry_after)
+            self.in_flight += 1
+        return Reservation(self)
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    async def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполнение в пуле без проверки допуска (внутри уже полученного reserve())"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, partial(func, *args, **kwargs))
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Допуск и выполнение func(*args, **kwargs) в пуле"""
+        with self.reserve():
+            return await self.call(func, *args, **kwargs)
+
+    async def iterate(self, iterator: Iterator, reservation: Optional[Reservation] = None) -> AsyncIterator:
+        """Потребление синхронного генератора в пуле (для потоковых ответов)
+
+        Весь поток занимает один допуск reservation. По окончании, ошибке или обрыве
+        потока генератор закрывается, затем допуск освобождается. Если обрыв пришелся
+        на выполняемый в пуле next(), генератор закрывает тот же поток по завершении
+        шага - отдельный поток пула ради закрытия не занимается.
+        """
+        lock = threading.Lock()
+        state = {"running": False, "closing": False}
+
+        def finish():
+            try:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+            except Exception as e:
+                logger.warning(f"Ошибка закрытия потока {self.name}: {e}")
+            finally:
+                if reservation is not None:
+                    reservation.release()
+
+        def step():
+            with lock:
+                if state["closing"]:
+                    return _DONE
+                state["running"] = True
+            try:
+                return next(iterator, _DONE)
+            finally:
+                with lock:
+                    state["running"] = False
+                    closing = state["closing"]
+                if closing:
+                    finish()
+
+        try:
+            while True:
+                item = await self.call(step)
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            with lock:
+                state["closing"] = True
+                running = state["running"]
+            if not running:
+                # Генератор завершен или стоит на yield - закрытие быстрое и без await
+                # (при отмене задачи ожидание в finally было бы прервано)
+                finish()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "max_workers": self.max_workers,
+                "max_queued": self.max_queued,
+                "rejected": self.rejected,
+            }
+
+analysis_executor = BoundedExecutor(
+    "analysis",
+    max_workers=settings.ANALYSIS_MAX_CONCURRENT_REQUESTS,
+    max_queued=settings.ANALYSIS_MAX_QUEUED_REQUESTS,
+    retry_after=settings.BUSY_RETRY_AFTER_SECONDS
+)
+preview_executor = BoundedExecutor(
+    "preview",
+    max_workers=settings.PREVIEW_MAX_CONCURRENT_REQUESTS,
+    max_queued=settings.PREVIEW_MAX_QUEUED_REQUESTS,
+    retry_after=settings.BUSY_RETRY_AFTER_SECONDS
+)
+export_executor = BoundedExecutor(
+    "export",
+    max_workers=settings.EXPORT_MAX_CONCURRENT_REQUESTS,
+    max_queued=settings.EXPORT_MAX_QUEUED_REQUESTS,
+    retry_after=settings.BUSY_RETRY_AFTER_SECONDS
+)
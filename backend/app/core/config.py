@@ -1,10 +1,91 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
+import os
+
+# Каталог данных приложения по умолчанию (кэши и хранилища), только для текущего пользователя
+DATA_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "role_matching"
+)
 
 class Settings(BaseSettings):
     APP_NAME: str = "Role Matching API"
     DEBUG: bool = False
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
+
+    # Нечеткое сопоставление ролей
+    MATCH_THRESHOLD: int = 60
+    MATCH_TOP_K: Optional[int] = None  # None - возвращать всех кандидатов выше порога
+    MATCH_WORKERS: int = -1  # потоки матричного скорера, -1 - все ядра
+    MATCH_BATCH_CELLS: int = 4_000_000  # размер блока матрицы сходства (значения × роли)
+    # Отбор кандидатов через n-граммный индекс: окупается, только если кандидатов заметно меньше ролей
+    MATCH_NGRAM_PRUNING: bool = False
+    MATCH_NGRAM_MAX_SHORTLIST: float = 0.25  # доля ролей, при большем числе кандидатов блок сравнивается со всеми
+    MATCH_NGRAM_SIZE: int = 1
+    # Порог схожести вариантов написания: 100 - только одинаковые после очистки (результат точный),
+    # ниже - похожие значения получают кандидатов и оценки представителя группы
+    MATCH_CLUSTER_THRESHOLD: int = 100
+    MATCH_POOL_SIZE: int = 0  # процессы пула сопоставления, 0 - по числу ядер, 1 - без пула
+    MATCH_POOL_CHUNK_SIZE: int = 500  # значений в одной задаче пула
+    MATCH_POOL_MIN_VALUES: int = 2000  # меньше значений - поиск в текущем процессе
+
+    # Нормализация названий (ExcelService.clean_name)
+    NORMALIZATION_EXTRA_NOISE_WORDS: List[str] = []  # дополнительные общие слова, удаляемые при очистке
+    NORMALIZATION_CACHE_SIZE: int = 100_000
+
+    # Кэш разобранных листов Excel (общий для предпросмотра и анализа)
+    WORKBOOK_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    # Дисковый кэш листов (Arrow/Feather), общий для всех процессов; пустая строка - отключен
+    WORKBOOK_DISK_CACHE_DIR: str = os.path.join(DATA_DIR, "sheets")
+    WORKBOOK_DISK_CACHE_MAX_BYTES: int = 4 * 1024 * 1024 * 1024
+    WORKBOOK_DISK_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+
+    # Контекст завершенных анализов для /process с листом опроса и колонками справочника; пустая строка - только память
+    ANALYSIS_STORE_DIR: str = os.path.join(DATA_DIR, "analyses")
+    ANALYSIS_STORE_TTL_SECONDS: int = 24 * 60 * 60
+
+    # Результаты /process для /download-result, общие для всех процессов
+    RESULT_STORE_DIR: str = os.path.join(DATA_DIR, "results")
+    RESULT_STORE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    RESULT_STORE_TTL_SECONDS: int = 24 * 60 * 60
+
+    # Ответы API: gzip для ответов от GZIP_MINIMUM_SIZE байт, кроме потоковых и файловых путей
+    # (потоки не должны буферизоваться, файлы отдаются с Range)
+    GZIP_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESS_LEVEL: int = 5  # выше - заметно больше CPU при небольшом выигрыше в размере
+    GZIP_EXCLUDED_PATHS: List[str] = ["/api/analyze/stream", "/api/download-result"]
+    # Проверка крупных ответов, собранных сервером, по response_model (для отладки)
+    VALIDATE_TRUSTED_RESPONSES: bool = False
+
+    # Предпросмотр и постраничная выдача листов
+    PREVIEW_ROWS: int = 100  # строк каждого листа в /file-preview
+    SHEET_DATA_DEFAULT_LIMIT: int = 1000
+    SHEET_DATA_MAX_LIMIT: int = 10_000
+
+    # Загрузки разбираются из временных файлов, без чтения в память целиком
+    UPLOAD_MAX_BYTES: int = 200 * 1024 * 1024  # размер файла, больше - 413
+    UPLOAD_MAX_UNCOMPRESSED_BYTES: int = 2 * 1024 * 1024 * 1024  # распакованный xlsx по оглавлению zip, больше - 413
+    UPLOAD_SPOOL_MAX_BYTES: int = 8 * 1024 * 1024  # копии загрузок фоновых задач держатся в памяти до этого размера
+    EXCEL_STREAMING_THRESHOLD_BYTES: int = 64 * 1024 * 1024  # XML листов больше - нужные колонки читаются потоково
+
+    # Экспорт результата: файл собирается в каталоге результата и отдается порциями
+    EXPORT_CHUNK_SIZE: int = 1024 * 1024  # размер порции при отдаче файла
+
+    # Фоновые задачи анализа (/analyze/jobs)
+    ANALYSIS_MAX_CONCURRENT_JOBS: int = 2  # одновременно выполняемых задач в процессе
+    ANALYSIS_MAX_QUEUED_JOBS: int = 20  # ожидающих задач сверх выполняемых, дальше - 429
+    ANALYSIS_JOB_TTL_SECONDS: int = 60 * 60  # хранение завершенных задач с результатом
+    # Статус и результат задач для всех процессов uvicorn; пустая строка - только принявший задачу процесс
+    ANALYSIS_JOB_DIR: str = os.path.join(DATA_DIR, "jobs")
+
+    # Тяжелые этапы запросов выполняются в ограниченных пулах потоков по классам эндпоинтов;
+    # сверх выполняемых и ожидающих запросов - ответ 503 с Retry-After
+    ANALYSIS_MAX_CONCURRENT_REQUESTS: int = 2  # /analyze, /analyze/stream
+    ANALYSIS_MAX_QUEUED_REQUESTS: int = 4
+    PREVIEW_MAX_CONCURRENT_REQUESTS: int = 4  # /file-preview, /sheet-data
+    PREVIEW_MAX_QUEUED_REQUESTS: int = 16
+    EXPORT_MAX_CONCURRENT_REQUESTS: int = 2  # /process, /download-result
+    EXPORT_MAX_QUEUED_REQUESTS: int = 8
+    BUSY_RETRY_AFTER_SECONDS: int = 5
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,21 @@
+from typing import List
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZip-сжатие ответов, кроме путей из excluded_paths
+
+    GZipMiddleware буферизует потоковые ответы внутри gzip (записи NDJSON/SSE
+    приходили бы с задержкой) и меняет тело ответов с Content-Range, поэтому
+    потоковые и файловые эндпоинты отдаются без сжатия.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, compresslevel: int, excluded_paths: List[str]):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.excluded_paths = tuple(excluded_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self.excluded_paths):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
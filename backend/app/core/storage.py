@@ -0,0 +1,15 @@
+import os
+
+def ensure_private_dir(path: str) -> str:
+    """Каталог данных приложения, доступный только текущему пользователю (0o700)
+
+    Сервер читает файлы из этих каталогов, поэтому существующий каталог другого
+    пользователя не принимается (PermissionError), а лишние права снимаются.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    stat = os.stat(path)
+    if hasattr(os, "getuid") and stat.st_uid != os.getuid():
+        raise PermissionError(f"Directory {path} is owned by another user")
+    if stat.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
@@ -1,17 +1,29 @@
 # app/main.py - ОБНОВЛЕННАЯ ВЕРСИЯ
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from .core.config import settings
+from .core.middleware import SelectiveGZipMiddleware
+from .api.payloads import FastJSONResponse
+from .services.matching_executor import matching_executor
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Процессы пула сопоставления завершаются вместе с приложением
+    matching_executor.shutdown()
+
 app = FastAPI(
     title="Role Matching API",
     description="API для умного сопоставления ролей ТУ/ТВ/ИВ",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -23,6 +35,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Сжатие крупных JSON-ответов (предпросмотр, результаты анализа и обработки)
+app.add_middleware(
+    SelectiveGZipMiddleware,
+    minimum_size=settings.GZIP_MINIMUM_SIZE,
+    compresslevel=settings.GZIP_COMPRESS_LEVEL,
+    excluded_paths=settings.GZIP_EXCLUDED_PATHS
+)
+
 # Подключаем роутеры
 from .api.endpoints import analysis, processing, file_preview  # ДОБАВЛЯЕМ ИМПОРТ
 
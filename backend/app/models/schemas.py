@@ -33,6 +33,22 @@ class AnalysisResponse(BaseModel):
     unique_iv: List[str]
     pending_matches: Dict[str, List[PendingMatch]]
     auto_matches: Dict[str, List[AutoMatch]]
+    analysis_id: Optional[str] = None  # ключ контекста анализа для /process
+
+class StageProgress(BaseModel):
+    done: int
+    total: int
+
+class AnalysisJobStatus(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed, failed, cancelled
+    stage: Optional[str] = None
+    progress: Dict[str, StageProgress] = {}
+    error: Optional[str] = None
+    result: Optional[AnalysisResponse] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
 
 class ProcessRequest(BaseModel):
     analysis_data: Dict[str, Any]
@@ -45,4 +61,9 @@ class FilePreviewResponse(BaseModel):
 
 class SheetDataResponse(BaseModel):
     columns: List[str]
-    preview_data: List[Dict[str, Any]]
\ No newline at end of file
+    preview_data: Optional[List[Dict[str, Any]]] = None  # layout=records
+    rows: Optional[List[List[Any]]] = None  # layout=columns
+    total_rows: int
+    sheet_rows: Optional[int] = None
+    offset: int = 0
+    limit: Optional[int] = None
\ No newline at end of file
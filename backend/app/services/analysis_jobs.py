@@ -0,0 +1,217 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+import logging
+import threading
+import time
+import uuid
+from .analysis_pipeline import AnalysisInputError, AnalysisPipeline
+from .job_store import job_store
+from .matching_executor import matching_executor
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class AnalysisCancelled(Exception):
+    """Задача анализа отменена пользователем"""
+
+class JobQueueFullError(Exception):
+    """Достигнут предел одновременно выполняемых и ожидающих задач"""
+
+class AnalysisJob:
+    def __init__(self, params: Dict[str, Any]):
+        self.job_id = uuid.uuid4().hex
+        self.params: Optional[Dict[str, Any]] = params
+        self.status = "queued"
+        self.stage: Optional[str] = None
+        self.progress: Dict[str, Dict[str, int]] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.future: Optional[Future] = None
+        self.save_lock = threading.Lock()
+        self.saved_at = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+class AnalysisJobManager:
+    """Фоновые задачи анализа в пуле потоков текущего процесса.
+
+    Одновременно выполняется не больше max_concurrent задач, остальные ждут в очереди
+    (не больше max_queued, иначе JobQueueFullError). Ход выполнения хранится по этапам
+    AnalysisPipeline.STAGES. Отмена ожидающей задачи снимает ее с очереди, выполняющейся -
+    прерывает анализ на ближайшей границе этапа или порции поиска. Завершенные задачи
+    вместе с результатом хранятся ttl_seconds. Задача выполняется в принявшем ее процессе,
+    ее снимки пишутся в JobStore, поэтому статус, результат и отмена доступны из любого
+    процесса uvicorn. Лимиты очереди действуют в пределах процесса.
+    """
+
+    PROGRESS_SAVE_INTERVAL = 0.5  # секунд между записями прогресса в хранилище
+
+    def __init__(self, pipeline: AnalysisPipeline, max_concurrent: int, max_queued: int, ttl_seconds: int,
+                 store=None):
+        self.pipeline = pipeline
+        self.store = store or job_store
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max_queued
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, AnalysisJob] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="analysis-job")
+        return self._pool
+
+    def submit(self, **params) -> Dict[str, Any]:
+        """Постановка анализа в очередь, params - аргументы AnalysisPipeline.run"""
+        with self._lock:
+            self._prune()
+            active = sum(1 for job in self._jobs.values() if not job.finished)
+            if active >= self.max_concurrent + self.max_queued:
+                raise JobQueueFullError(f"Too many analysis jobs in progress: {active}")
+            job = AnalysisJob(params)
+            self._jobs[job.job_id] = job
+            snapshot = self._snapshot(job)
+        # Снимок пишется до запуска: первый опрос статуса может прийти в другой процесс
+        self._save(job)
+        with self._lock:
+            job.future = self._get_pool().submit(self._run, job)
+        logger.info(f"Задача анализа {job.job_id} поставлена в очередь")
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return self._snapshot(job)
+        # Задача другого процесса (или уже удаленная из памяти этого)
+        snapshot = self.store.get(job_id)
+        if snapshot is not None and snapshot["finished_at"] is not None and \
+                time.time() - snapshot["finished_at"] > self.ttl_seconds:
+            return None
+        return snapshot
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            # Задачу выполняет другой процесс: он завершит ее по метке отмены
+            snapshot = self.store.request_cancel(job_id)
+            if snapshot is not None:
+                logger.info(f"Задача анализа {job_id}: запрошена отмена в другом процессе")
+            return snapshot
+
+        with self._lock:
+            if not job.finished:
+                job.cancel_event.set()
+                if job.future is not None and job.future.cancel():
+                    self._finish(job, "cancelled")
+                logger.info(f"Задача анализа {job_id}: запрошена отмена")
+        self._save(job)
+        with self._lock:
+            return self._snapshot(job)
+
+    def _cancel_requested(self, job: AnalysisJob) -> bool:
+        return job.cancel_event.is_set() or self.store.cancel_requested(job.job_id)
+
+    def _save(self, job: AnalysisJob):
+        """Запись снимка задачи в хранилище; снимки одной задачи пишутся по порядку"""
+        with job.save_lock:
+            with self._lock:
+                snapshot = self._snapshot(job)
+                job.saved_at = time.time()
+            self.store.put(snapshot)
+
+    def _run(self, job: AnalysisJob):
+        cancelled = self._cancel_requested(job)
+        with self._lock:
+            if cancelled:
+                self._finish(job, "cancelled")
+            else:
+                job.status = "running"
+                job.started_at = time.time()
+                params = job.params
+        self._save(job)
+        if cancelled:
+            return
+
+        def progress(stage: str, done: int, total: int):
+            if self._cancel_requested(job):
+                raise AnalysisCancelled()
+            with self._lock:
+                job.stage = stage
+                job.progress[stage] = {"done": done, "total": total}
+                save = time.time() - job.saved_at >= self.PROGRESS_SAVE_INTERVAL
+            if save:
+                self._save(job)
+
+        try:
+            result = self.pipeline.run(**params, progress=progress)
+        except AnalysisCancelled:
+            with self._lock:
+                self._finish(job, "cancelled")
+            logger.info(f"Задача анализа {job.job_id} отменена")
+        except AnalysisInputError as e:
+            with self._lock:
+                self._finish(job, "failed", error=str(e))
+        except Exception as e:
+            logger.error(f"Unexpected error in analysis job {job.job_id}: {e}")
+            with self._lock:
+                self._finish(job, "failed", error=f"Internal server error: {str(e)}")
+        else:
+            with self._lock:
+                for stage, counts in job.progress.items():
+                    counts["done"] = counts["total"]
+                self._finish(job, "completed", result=result)
+            logger.info(f"Задача анализа {job.job_id} завершена за {job.finished_at - job.started_at:.1f} с")
+        self._save(job)
+
+    @staticmethod
+    def _finish(job: AnalysisJob, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        if job.params is not None:
+            # Копии загруженных файлов больше не нужны
+            for value in job.params.values():
+                if hasattr(value, "close"):
+                    value.close()
+        job.params = None
+
+    def _prune(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished_at > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _snapshot(job: AnalysisJob) -> Dict[str, Any]:
+        return {
+            "job_id": job.job_id,
+            "status": job.status,
+            "stage": job.stage,
+            "progress": {stage: dict(counts) for stage, counts in job.progress.items()},
+            "error": job.error,
+            "result": job.result,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+
+analysis_job_manager = AnalysisJobManager(
+    pipeline=AnalysisPipeline(executor=matching_executor),
+    max_concurrent=settings.ANALYSIS_MAX_CONCURRENT_JOBS,
+    max_queued=settings.ANALYSIS_MAX_QUEUED_JOBS,
+    ttl_seconds=settings.ANALYSIS_JOB_TTL_SECONDS
+)
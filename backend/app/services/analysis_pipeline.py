@@ -0,0 +1,211 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import logging
+import time
+import pandas as pd
+from .excel_service import ExcelService
+from .matching_service import MatchingService
+from .role_index import RoleIndex
+from .replacement_engine import ReplacementEngine
+from .analysis_store import analysis_store
+
+logger = logging.getLogger(__name__)
+
+# progress(этап, обработано, всего)
+ProgressCallback = Callable[[str, int, int], None]
+
+class AnalysisInputError(ValueError):
+    """Ошибка во входных данных анализа (нет колонки, файл не читается) - ответ 400"""
+
+class AnalysisPipeline:
+    """Анализ опроса и справочника ролей: от содержимого файлов до AnalysisResponse.
+
+    Общий для синхронного /analyze, потоковой выдачи и фоновых задач анализа. Ход выполнения
+    сообщается через progress по этапам STAGES; исключение из progress (отмена
+    задачи) прерывает анализ на ближайшей границе этапа или порции поиска.
+    """
+
+    STAGES = ("load", "replacements", "unique_values", "auto_matches", "fuzzy_matches")
+
+    def __init__(self, excel_service: Optional[ExcelService] = None,
+                 matching_service: Optional[MatchingService] = None, executor=None, store=None):
+        self.excel_service = excel_service or ExcelService()
+        self.matching_service = matching_service or MatchingService()
+        self.executor = executor
+        self.store = store or analysis_store
+
+    @staticmethod
+    def prepare_survey(survey_df: pd.DataFrame, columns: List[str], replacements: List[Dict]) -> pd.DataFrame:
+        """Копия листа опроса: колонки columns как строки (пустые - ''), с примененными заменами
+
+        Список замен компилируется один раз, каждое различное значение колонки
+        обрабатывается один раз. Загруженный лист общий с кэшем, поэтому изменяется копия.
+        """
+        survey_df = survey_df.copy()
+        replacement_engine = ReplacementEngine(replacements)
+        for col in columns:
+            if col in survey_df.columns:
+                survey_df[col] = survey_df[col].astype(str).replace('nan', '')
+                survey_df[col] = replacement_engine.apply_series(survey_df[col])
+        return survey_df
+
+    def run(
+        self,
+        survey_content: bytes,
+        roles_content: bytes,
+        control_col: str,
+        operation_cols: List[str],
+        role_col: str,
+        uid_col: str,
+        replacements: List[Dict],
+        progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """Полный анализ, результат в формате AnalysisResponse"""
+        result: Dict[str, Any] = {"pending_matches": {"TU": [], "TV": [], "IV": []}}
+        for record in self.iter_results(survey_content, roles_content, control_col, operation_cols,
+                                        role_col, uid_col, replacements, progress):
+            if record["type"] == "pending_matches":
+                result["pending_matches"][record["role_type"]].extend(record["matches"])
+            elif record["type"] != "summary":
+                result.update({key: value for key, value in record.items() if key != "type"})
+        return result
+
+    def iter_results(
+        self,
+        survey_content: bytes,
+        roles_content: bytes,
+        control_col: str,
+        operation_cols: List[str],
+        role_col: str,
+        uid_col: str,
+        replacements: List[Dict],
+        progress: Optional[ProgressCallback] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Результат анализа по мере готовности, записи различаются полем type:
+
+        - unique_values: analysis_id (ключ для /process), unique_tu, unique_tv, unique_iv;
+        - auto_matches: точные и нормализованные совпадения всех типов;
+        - pending_matches: role_type и matches - часть кандидатов нечеткого поиска
+          (записей столько, сколько порций поиска);
+        - summary: число значений по типам и время анализа.
+        Ошибки входных данных (AnalysisInputError) возникают до первой записи.
+        """
+        started = time.perf_counter()
+        report = progress or (lambda stage, done, total: None)
+
+        # Загрузка первых листов, все значения как строки. Опрос читается целиком: итог /process
+        # дополняет все колонки строк опроса, лист сохраняется с контекстом анализа; из справочника - только нужные колонки
+        report("load", 0, 2)
+        try:
+            survey_hash = self.excel_service.content_hash(survey_content)
+            roles_hash = self.excel_service.content_hash(roles_content)
+            survey_df = self.excel_service.load_excel_sheet(survey_content, content_hash=survey_hash)
+            report("load", 1, 2)
+            roles_df = self.excel_service.load_excel_sheet(
+                roles_content, columns=[role_col, uid_col], content_hash=roles_hash
+            )
+        except Exception as e:
+            logger.error(f"Excel loading error: {e}")
+            raise AnalysisInputError(f"Invalid Excel file format: {str(e)}")
+        report("load", 2, 2)
+
+        # Проверка существования колонок
+        if control_col not in survey_df.columns:
+            raise AnalysisInputError(f"Column '{control_col}' not found in survey file")
+        if role_col not in roles_df.columns:
+            raise AnalysisInputError(f"Column '{role_col}' not found in roles file")
+        if uid_col not in roles_df.columns:
+            raise AnalysisInputError(f"Column '{uid_col}' not found in roles file")
+
+        for op_col in operation_cols:
+            if op_col not in survey_df.columns:
+                raise AnalysisInputError(f"Operation column '{op_col}' not found in survey file")
+
+        # Применение замен к данным (в копии листа из кэша)
+        cols_to_process = [control_col] + operation_cols
+        report("replacements", 0, len(cols_to_process))
+        prepared_df = self.prepare_survey(survey_df[cols_to_process], cols_to_process, replacements)
+        report("replacements", len(cols_to_process), len(cols_to_process))
+
+        # Сбор уникальных значений (векторно, без обхода строк)
+        report("unique_values", 0, 1)
+        unique_control, unique_operation, unique_iv = self.excel_service.collect_unique_values(
+            prepared_df, control_col, operation_cols
+        )
+
+        # Создание словаря ролей
+        roles_dict, role_names = self.excel_service.build_roles_dict(roles_df, role_col, uid_col)
+
+        # Индекс ролей строится один раз: очистка названий O(ролей), а не O(ролей × значений)
+        role_index = RoleIndex(role_names)
+        report("unique_values", 1, 1)
+
+        # Контекст для /process вместе с листом опроса (до замен) и колонками справочника
+        analysis_id = self.store.put({
+            "survey_hash": survey_hash,
+            "survey_sheet": self.excel_service.get_sheet_names(survey_content, survey_hash)[0],
+            "roles_hash": roles_hash,
+            "roles_sheet": self.excel_service.get_sheet_names(roles_content, roles_hash)[0],
+            "control_col": control_col,
+            "operation_cols": operation_cols,
+            "role_col": role_col,
+            "uid_col": uid_col,
+            "replacements": replacements
+        }, tables={"survey": survey_df, "roles": roles_df})
+        yield {
+            "type": "unique_values",
+            "analysis_id": analysis_id,
+            "unique_tu": unique_control,
+            "unique_tv": unique_operation,
+            "unique_iv": unique_iv
+        }
+
+        # Анализ сопоставлений
+        auto_matches = {"TU": [], "TV": [], "IV": []}
+        unmatched = {"TU": [], "TV": [], "IV": []}
+
+        # Точные совпадения ТУ/ТВ/ИВ, затем совпадения по каноническому ключу
+        typed_values = (("TU", unique_control), ("TV", unique_operation), ("IV", unique_iv))
+        total_values = sum(len(values) for _, values in typed_values)
+        done = 0
+        report("auto_matches", 0, total_values)
+        for role_type, values in typed_values:
+            prefix = RoleIndex.PREFIXES[role_type]
+            for val in values:
+                role_name = f"{prefix} {val}"
+                match_type = "exact"
+                if role_name not in roles_dict:
+                    role_name = role_index.lookup_canonical(role_type, val)
+                    match_type = "normalized"
+
+                if role_name is not None:
+                    auto_matches[role_type].append({
+                        "original": val,
+                        "matched": role_name,
+                        "uid": roles_dict[role_name],
+                        "type": match_type
+                    })
+                else:
+                    unmatched[role_type].append(val)
+            done += len(values)
+            report("auto_matches", done, total_values)
+
+        yield {"type": "auto_matches", "auto_matches": auto_matches}
+
+        # Нечеткий поиск для всех оставшихся значений (крупные объемы - в пуле процессов)
+        report("fuzzy_matches", 0, sum(len(values) for values in unmatched.values()))
+        pending_counts = {"TU": 0, "TV": 0, "IV": 0}
+        for role_type, matches in self.matching_service.iter_match_unique_values(
+            unmatched, role_index, executor=self.executor,
+            progress=lambda done, total: report("fuzzy_matches", done, total)
+        ):
+            if matches:
+                pending_counts[role_type] += len(matches)
+                yield {"type": "pending_matches", "role_type": role_type, "matches": matches}
+
+        yield {
+            "type": "summary",
+            "unique": {"TU": len(unique_control), "TV": len(unique_operation), "IV": len(unique_iv)},
+            "auto_matches": {role_type: len(items) for role_type, items in auto_matches.items()},
+            "pending_matches": pending_counts,
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        }
@@ -0,0 +1,198 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from ..core.config import settings
+from ..core.storage import ensure_private_dir
+
+logger = logging.getLogger(__name__)
+
+class AnalysisStore:
+    """Контекст завершенных анализов для /process, ключ - analysis_id.
+
+    Контекст - параметры анализа: хэши файлов, листы, колонки и замены; analysis_id -
+    его хэш, поэтому повторный анализ тех же файлов с теми же параметрами дает тот же id.
+    Вместе с контекстом сохраняются таблицы, нужные /process (строки опроса и колонки
+    справочника): кэши листов вытесняемые и пропускают часть листов, на них /process
+    опираться не может. Контекст пишется JSON-файлом, таблицы - файлами Arrow рядом с ним
+    в каталоге, общем для процессов uvicorn; последние max_entries контекстов держатся
+    в памяти. Записи старше ttl_seconds считаются устаревшими. Без каталога записи
+    (вместе с таблицами) хранятся только в памяти.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: int, max_entries: int = 1000):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            ensure_private_dir(directory)
+
+    def _path(self, analysis_id: str) -> str:
+        return os.path.join(self.directory, f"{analysis_id}.json")
+
+    def _table_path(self, analysis_id: str, name: str) -> str:
+        return os.path.join(self.directory, f"{analysis_id}.{name}.arrow")
+
+    @staticmethod
+    def _encode_column(column: Any) -> List[Any]:
+        """Имя колонки для метаданных Arrow: заголовки Excel бывают числами и датами"""
+        if isinstance(column, (bool, np.bool_)):
+            return ["bool", bool(column)]
+        if isinstance(column, (int, np.integer)):
+            return ["int", int(column)]
+        if isinstance(column, (float, np.floating)):
+            return ["float", float(column)]
+        if isinstance(column, datetime):
+            return ["datetime", column.isoformat()]
+        return ["str", str(column)]
+
+    @staticmethod
+    def _decode_column(encoded: List[Any]) -> Any:
+        kind, value = encoded
+        if kind == "datetime":
+            return datetime.fromisoformat(value)
+        return value
+
+    def _expired(self, path: str) -> bool:
+        return time.time() - os.path.getmtime(path) > self.ttl_seconds
+
+    def _write_table(self, analysis_id: str, name: str, df: pd.DataFrame):
+        """Таблица в Arrow под позиционными именами, исходные имена - в метаданных схемы"""
+        path = self._table_path(analysis_id, name)
+        if os.path.exists(path) and not self._expired(path):
+            # Тот же id - те же файлы и параметры, таблица уже записана
+            os.utime(path)
+            return
+        values = df.copy(deep=False)
+        values.columns = [f"c{position}" for position in range(len(df.columns))]
+        table = pa.Table.from_pandas(values, preserve_index=False)
+        columns = json.dumps([self._encode_column(column) for column in df.columns], ensure_ascii=False)
+        table = table.replace_schema_metadata({"columns": columns})
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            feather.write_feather(table, tmp_path, compression="uncompressed")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put(self, context: Dict[str, Any], tables: Optional[Dict[str, pd.DataFrame]] = None) -> str:
+        """Сохранение контекста и таблиц анализа; возвращает analysis_id
+
+        Таблицы пишутся до контекста: найденный контекст означает, что таблицы записаны.
+        Если записать таблицы не удалось, контекст на диск не пишется.
+        """
+        payload = json.dumps(context, ensure_ascii=False, sort_keys=True)
+        analysis_id = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+        tables = tables or {}
+
+        with self._lock:
+            self._entries[analysis_id] = {
+                "context": context,
+                # С каталогом таблицы читаются с диска: в памяти - только контексты
+                "tables": {} if self.directory else tables,
+                "created_at": time.time()
+            }
+            self._entries.move_to_end(analysis_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        if self.directory:
+            try:
+                for name, df in tables.items():
+                    self._write_table(analysis_id, name, df)
+            except (OSError, pa.ArrowException) as e:
+                logger.warning(f"Не удалось сохранить таблицы анализа {analysis_id}: {e}")
+                # Анализ остается доступен /process хотя бы в этом процессе
+                with self._lock:
+                    entry = self._entries.get(analysis_id)
+                    if entry is not None:
+                        entry["tables"] = tables
+                return analysis_id
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(payload)
+                os.replace(tmp_path, self._path(analysis_id))
+            except OSError as e:
+                logger.warning(f"Не удалось сохранить контекст анализа {analysis_id}: {e}")
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self.cleanup()
+        return analysis_id
+
+    def get(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(analysis_id)
+            if entry is not None and time.time() - entry["created_at"] <= self.ttl_seconds:
+                return entry["context"]
+
+        if not self.directory or not analysis_id.isalnum():
+            return None
+        path = self._path(analysis_id)
+        try:
+            if self._expired(path):
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_table(self, analysis_id: str, name: str) -> Optional[pd.DataFrame]:
+        """Таблица анализа с исходными именами колонок; None - нет или устарела"""
+        with self._lock:
+            entry = self._entries.get(analysis_id)
+            if entry is not None and name in entry["tables"] and \
+                    time.time() - entry["created_at"] <= self.ttl_seconds:
+                return entry["tables"][name]
+
+        if not self.directory or not analysis_id.isalnum():
+            return None
+        path = self._table_path(analysis_id, name)
+        try:
+            if self._expired(path):
+                return None
+            table = feather.read_table(path)
+            columns = [self._decode_column(column) for column in json.loads(table.schema.metadata[b"columns"])]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, pa.ArrowException) as e:
+            logger.warning(f"Не удалось прочитать таблицу анализа {analysis_id}: {e}")
+            return None
+        df = table.to_pandas()
+        df.columns = columns
+        # Arrow возвращает пустые строковые ячейки как None, в листах Excel они NaN
+        return df.where(df.notna(), np.nan)
+
+    def cleanup(self):
+        """Удаление устаревших файлов контекста и таблиц"""
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith((".json", ".arrow")):
+                continue
+            try:
+                if now - entry.stat().st_mtime > self.ttl_seconds:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+analysis_store = AnalysisStore(
+    directory=settings.ANALYSIS_STORE_DIR,
+    ttl_seconds=settings.ANALYSIS_STORE_TTL_SECONDS
+)
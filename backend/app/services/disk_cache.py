@@ -0,0 +1,177 @@
+from typing import Dict, Hashable, List, Optional
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+from ..core.config import settings
+from ..core.storage import ensure_private_dir
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # без pyarrow дисковый кэш отключается
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+class DiskWorkbookCache:
+    """Кэш разобранных листов Excel на локальном диске в формате Arrow IPC (Feather v2).
+
+    Файлы пишутся без сжатия и открываются через memory map, поэтому все процессы
+    uvicorn используют один кэш и переживают перезапуск без повторного разбора xlsx.
+    Запись атомарная (временный файл + os.replace). Устаревшие по TTL файлы удаляются,
+    при превышении объема удаляются давно не использованные.
+    """
+
+    SUFFIX = ".arrow"
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: int, cleanup_interval: int = 60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.cleanup_interval = cleanup_interval
+        self.enabled = bool(directory) and pa is not None
+        self.hits = 0
+        self.misses = 0
+        self._last_cleanup = 0.0
+        self._lock = threading.Lock()
+
+        if directory and pa is None:
+            logger.warning("pyarrow не установлен - дисковый кэш листов отключен")
+        if self.enabled:
+            ensure_private_dir(directory)
+
+    def _path(self, key: Hashable) -> str:
+        content_hash, sheet, columns = key
+        digest = hashlib.sha1(
+            json.dumps([sheet, None if columns is None else list(columns)], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        return os.path.join(self.directory, f"{content_hash}_{digest}{self.SUFFIX}")
+
+    def _sheet_names_path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, f"{content_hash}.sheets.json")
+
+    def _expired(self, path: str) -> bool:
+        return time.time() - os.path.getmtime(path) > self.ttl_seconds
+
+    def _write_atomic(self, path: str, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get(self, key: Hashable) -> Optional[pd.DataFrame]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            if self._expired(path):
+                raise FileNotFoundError(path)
+            table = feather.read_table(path, memory_map=True)
+            os.utime(path)  # время доступа для вытеснения по давности использования
+        except (OSError, pa.ArrowException):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        df = table.to_pandas()
+        # Arrow возвращает пустые строковые ячейки как None, в кэше памяти они NaN
+        return df.where(df.notna(), np.nan)
+
+    def put(self, key: Hashable, df: pd.DataFrame):
+        if not self.enabled:
+            return
+        if not all(isinstance(column, str) for column in df.columns):
+            # Arrow требует строковые имена колонок - такие листы остаются только в памяти
+            return
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self._write_atomic(
+                self._path(key),
+                lambda path: feather.write_feather(table, path, compression="uncompressed")
+            )
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"Не удалось сохранить лист в дисковый кэш: {e}")
+            return
+        self.cleanup()
+
+    def get_sheet_names(self, content_hash: str) -> Optional[List[str]]:
+        if not self.enabled:
+            return None
+        path = self._sheet_names_path(content_hash)
+        try:
+            if self._expired(path):
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_sheet_names(self, content_hash: str, sheet_names: List[str]):
+        if not self.enabled:
+            return
+
+        def write(path):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(list(sheet_names), f, ensure_ascii=False)
+
+        try:
+            self._write_atomic(self._sheet_names_path(content_hash), write)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить список листов в дисковый кэш: {e}")
+
+    def cleanup(self, force: bool = False):
+        """Удаление файлов старше TTL и самых давних при превышении объема"""
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_cleanup < self.cleanup_interval:
+                return
+            self._last_cleanup = now
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp") or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                self._remove(entry.path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            # Файл уже удален другим процессом или открыт (Windows)
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "enabled": self.enabled}
+
+disk_workbook_cache = DiskWorkbookCache(
+    directory=settings.WORKBOOK_DISK_CACHE_DIR,
+    max_bytes=settings.WORKBOOK_DISK_CACHE_MAX_BYTES,
+    ttl_seconds=settings.WORKBOOK_DISK_CACHE_TTL_SECONDS
+)
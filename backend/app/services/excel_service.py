@@ -6,17 +6,30 @@ from openpyxl.styles import PatternFill
 from openpyxl.utils.dataframe import dataframe_to_rows
 from fuzzywuzzy import fuzz
 import re
-from typing import Dict, List, Tuple, Any
+from typing import BinaryIO, Dict, List, Optional, Tuple, Any, Union
+import hashlib
 import logging
+import zipfile
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from pandas.io.parsers import TextParser
+from .normalization import normalization_pipeline
+from .workbook_cache import workbook_cache
+from .disk_cache import disk_workbook_cache
+from .sheet_query import SheetIndex
+from ..core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Содержимое файла в памяти или открытый файл (загрузка, сохраненная во временный файл)
+ExcelSource = Union[bytes, BinaryIO]
+
 class ExcelService:
     @staticmethod
-    def load_excel_sheets(file_content: bytes) -> Dict[str, pd.DataFrame]:
+    def load_excel_sheets(file_content: ExcelSource) -> Dict[str, pd.DataFrame]:
         """Загрузка Excel файла как словаря DataFrame"""
         try:
-            xls = pd.ExcelFile(BytesIO(file_content))
+            xls = pd.ExcelFile(ExcelService.open_source(file_content))
             sheets = {}
             for sheet_name in xls.sheet_names:
                 sheets[sheet_name] = pd.read_excel(xls, sheet_name=sheet_name)
@@ -26,6 +39,252 @@ class ExcelService:
             logger.error(f"Ошибка чтения файла Excel: {e}")
             raise
 
+    @staticmethod
+    def open_source(file_content: ExcelSource) -> BinaryIO:
+        """Файловый объект для чтения с начала: байты оборачиваются в BytesIO, файл перематывается"""
+        if isinstance(file_content, (bytes, bytearray)):
+            return BytesIO(file_content)
+        file_content.seek(0)
+        return file_content
+
+    @staticmethod
+    def content_hash(file_content: ExcelSource) -> str:
+        """Хэш содержимого файла - ключ кэша разобранных листов"""
+        if isinstance(file_content, (bytes, bytearray)):
+            return hashlib.sha256(file_content).hexdigest()
+        digest = hashlib.sha256()
+        handle = ExcelService.open_source(file_content)
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+        handle.seek(0)
+        return digest.hexdigest()
+
+    @staticmethod
+    def inspect_archive(file_content: ExcelSource) -> Optional[Dict[str, int]]:
+        """Размеры частей xlsx по оглавлению zip, без распаковки и разбора
+
+        uncompressed - объем всех распакованных файлов, worksheets - XML листов
+        (основа оценки памяти на разбор). None - файл не zip (xls).
+        """
+        handle = ExcelService.open_source(file_content)
+        try:
+            if not zipfile.is_zipfile(handle):
+                return None
+            with zipfile.ZipFile(handle) as archive:
+                infos = archive.infolist()
+        finally:
+            handle.seek(0)
+        return {
+            "compressed": sum(info.compress_size for info in infos),
+            "uncompressed": sum(info.file_size for info in infos),
+            "worksheets": sum(
+                info.file_size for info in infos
+                if info.filename.startswith("xl/worksheets/") and info.filename.endswith(".xml")
+            ),
+        }
+
+    @staticmethod
+    def get_sheet_names(file_content: ExcelSource, content_hash: Optional[str] = None) -> List[str]:
+        """Список листов файла (из кэша, если файл уже разбирался)"""
+        content_hash = content_hash or ExcelService.content_hash(file_content)
+        sheet_names = workbook_cache.get_sheet_names(content_hash)
+        if sheet_names is None:
+            sheet_names = disk_workbook_cache.get_sheet_names(content_hash)
+            if sheet_names is None:
+                sheet_names = pd.ExcelFile(ExcelService.open_source(file_content)).sheet_names
+                disk_workbook_cache.put_sheet_names(content_hash, sheet_names)
+            workbook_cache.put_sheet_names(content_hash, sheet_names)
+        return sheet_names
+
+    @staticmethod
+    def load_cached_sheet(content_hash: str, sheet: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """Лист из кэша разобранных листов (память, затем диск) без исходного файла; None - нет в кэше"""
+        full_key = (content_hash, sheet, None)
+        key = full_key if columns is None else (content_hash, sheet, tuple(columns))
+        found_key, df = workbook_cache.get_any([key, full_key])
+        if df is None:
+            # Лист мог разобрать другой процесс или процесс до перезапуска
+            for disk_key in (key, full_key):
+                df = disk_workbook_cache.get(disk_key)
+                if df is not None:
+                    found_key = disk_key
+                    workbook_cache.put(disk_key, df)
+                    break
+        if df is not None and found_key != key:
+            # Нужные колонки берутся из уже разобранного целого листа
+            wanted = set(columns)
+            df = df[[column for column in df.columns if column in wanted]]
+        return df
+
+    @staticmethod
+    def load_excel_sheet(file_content: ExcelSource, columns: Optional[List[str]] = None,
+                         sheet_name: Optional[str] = None, content_hash: Optional[str] = None) -> pd.DataFrame:
+        """Загрузка одного листа (по умолчанию первого) только с нужными колонками
+
+        Все значения читаются как строки (dtype=str), пустые ячейки остаются NaN.
+        Отсутствующие в файле колонки пропускаются - их наличие проверяет вызывающий код.
+        Остальные листы не разбираются. Если XML листов больше
+        EXCEL_STREAMING_THRESHOLD_BYTES, нужные колонки читаются потоково
+        (_read_sheet_columns) без построения полных строк. Результат кэшируется по хэшу содержимого
+        в памяти (workbook_cache) и на диске (disk_workbook_cache) и не должен
+        изменяться вызывающим кодом.
+        """
+        try:
+            content_hash = content_hash or ExcelService.content_hash(file_content)
+            sheet_names = ExcelService.get_sheet_names(file_content, content_hash)
+            if not sheet_names:
+                raise ValueError("No sheets found")
+            sheet = sheet_names[0] if sheet_name is None else sheet_name
+            if sheet not in sheet_names:
+                raise ValueError(f"Worksheet named '{sheet}' not found")
+
+            df = ExcelService.load_cached_sheet(content_hash, sheet, columns)
+            if df is not None:
+                return df
+            key = (content_hash, sheet, None if columns is None else tuple(columns))
+
+            df = None
+            archive = ExcelService.inspect_archive(file_content)
+            if columns is not None and archive is not None and \
+                    archive["worksheets"] >= settings.EXCEL_STREAMING_THRESHOLD_BYTES:
+                df = ExcelService._read_sheet_columns(file_content, sheet, columns)
+            if df is None:
+                usecols = None
+                if columns is not None:
+                    wanted = set(columns)
+                    usecols = lambda column: column in wanted
+                df = pd.read_excel(ExcelService.open_source(file_content), sheet_name=sheet,
+                                   usecols=usecols, dtype=str)
+            workbook_cache.put(key, df)
+            disk_workbook_cache.put(key, df)
+            logger.info(f"Загружен лист '{sheet}': {len(df)} строк, {len(df.columns)} колонок")
+            return df
+        except Exception as e:
+            logger.error(f"Ошибка чтения файла Excel: {e}")
+            raise
+
+    @staticmethod
+    def _convert_cell(cell) -> Any:
+        """Значение ячейки по правилам читателя openpyxl в pandas"""
+        if cell.value is None:
+            return ""
+        if cell.data_type == TYPE_ERROR:
+            return np.nan
+        if cell.data_type == TYPE_NUMERIC:
+            value = int(cell.value)
+            return value if value == cell.value else float(cell.value)
+        return cell.value
+
+    @staticmethod
+    def _read_sheet_columns(file_content: ExcelSource, sheet_name: str, columns: List[str]) -> Optional[pd.DataFrame]:
+        """Потоковое чтение только нужных колонок листа (результат как у pd.read_excel(usecols, dtype=str))
+
+        Строки читаются по одной в режиме read_only, из каждой сохраняются только ячейки
+        выбранных колонок, поэтому память не растет с шириной листа. None - колонки нельзя
+        сопоставить по заголовку (безымянные колонки, пустой заголовок), нужен pd.read_excel.
+        """
+        if any(str(column).startswith("Unnamed: ") for column in columns):
+            return None
+
+        book = load_workbook(ExcelService.open_source(file_content), read_only=True, data_only=True)
+        try:
+            sheet = book[sheet_name]
+            sheet.reset_dimensions()
+            rows = sheet.iter_rows()
+            header = [ExcelService._convert_cell(cell) for cell in next(rows, ())]
+            if all(value == "" for value in header):
+                return None
+            # Имена колонок как у pandas: пустые - "Unnamed: N", повторы - "A.1"
+            names = TextParser([header], header=0).read().columns.tolist()
+            wanted = set(columns)
+            positions = [position for position, name in enumerate(names) if name in wanted]
+            if not positions:
+                return None
+
+            data = []
+            last_filled = 0
+            for row in rows:
+                values = [ExcelService._convert_cell(cell) for cell in row]
+                data.append([values[position] if position < len(values) else "" for position in positions])
+                if any(value != "" for value in values):
+                    last_filled = len(data)
+        finally:
+            book.close()
+
+        # Пустые строки в конце листа pandas отбрасывает, в середине - оставляет
+        return TextParser(
+            [[names[position] for position in positions]] + data[:last_filled],
+            header=0, dtype=str, skip_blank_lines=False
+        ).read()
+
+    @staticmethod
+    def load_sheet_index(file_content: ExcelSource, sheet_name: str,
+                         content_hash: Optional[str] = None) -> SheetIndex:
+        """Лист целиком с ленивыми индексами для поиска, фильтрации и сортировки"""
+        content_hash = content_hash or ExcelService.content_hash(file_content)
+        df = ExcelService.load_excel_sheet(file_content, sheet_name=sheet_name, content_hash=content_hash)
+        return workbook_cache.get_index((content_hash, sheet_name, None), lambda: SheetIndex(df))
+
+    @staticmethod
+    def _sheet_row_count(xls: pd.ExcelFile, sheet_name: str) -> Optional[int]:
+        """Число строк данных по метаданным листа (<dimension>), без чтения ячеек"""
+        try:
+            max_row = xls.book[sheet_name].max_row
+        except Exception:
+            return None
+        return None if max_row is None else max(max_row - 1, 0)
+
+    @staticmethod
+    def sniff_workbook(file_content: ExcelSource, sample_rows: int) -> Dict[str, Dict[str, Any]]:
+        """Заголовки, первые sample_rows строк и число строк каждого листа
+
+        Если лист уже разобран целиком (кэш), данные берутся из кэша. Иначе лист читается
+        в потоковом режиме openpyxl (read_only) и чтение останавливается после выборки;
+        число строк берется из метаданных листа и может быть приблизительным
+        (total_rows_exact=False) или неизвестным (None).
+        """
+        content_hash = ExcelService.content_hash(file_content)
+        xls = None
+        sheets = {}
+        for sheet in ExcelService.get_sheet_names(file_content, content_hash):
+            _, cached = workbook_cache.get_any([(content_hash, sheet, None)])
+            if cached is not None:
+                sheets[sheet] = {
+                    "columns": cached.columns.tolist(),
+                    "sample": cached.iloc[:sample_rows],
+                    "total_rows": len(cached),
+                    "total_rows_exact": True
+                }
+                continue
+
+            if xls is None:
+                xls = pd.ExcelFile(ExcelService.open_source(file_content))
+            # Метаданные читаются до выборки: pandas сбрасывает размеры листа при чтении
+            declared_rows = ExcelService._sheet_row_count(xls, sheet)
+            sample = pd.read_excel(xls, sheet_name=sheet, nrows=sample_rows, dtype=str)
+            if len(sample) < sample_rows:
+                total_rows, exact = len(sample), True
+            else:
+                total_rows, exact = declared_rows, False
+
+            sheets[sheet] = {
+                "columns": sample.columns.tolist(),
+                "sample": sample,
+                "total_rows": total_rows,
+                "total_rows_exact": exact
+            }
+        return sheets
+
+    @staticmethod
+    def to_records(df: pd.DataFrame) -> List[Dict[str, str]]:
+        """Строки листа для JSON-ответа: пустые ячейки - пустые строки, значения - строки"""
+        return df.fillna('').astype(str).to_dict('records')
+
+    @staticmethod
+    def to_rows(df: pd.DataFrame) -> List[List[str]]:
+        """Строки листа массивами значений в порядке колонок (правила те же, что в to_records)"""
+        return df.fillna('').astype(str).values.tolist()
+
     @staticmethod
     def split_values(val) -> List[str]:
         """Разбивка значений, разделённых запятыми"""
@@ -33,6 +292,48 @@ class ExcelService:
             return []
         return [v.strip() for v in str(val).split(',') if v.strip()]
 
+    @staticmethod
+    def split_series(series: pd.Series) -> pd.Series:
+        """Векторная разбивка колонки значений через запятую (аналог split_values)"""
+        parts = series.dropna().astype(str).str.split(',').explode().str.strip()
+        return parts[parts.notna() & (parts != '')]
+
+    @staticmethod
+    def collect_unique_values(
+        survey_df: pd.DataFrame, control_col: str, operation_cols: List[str]
+    ) -> Tuple[List[str], List[str], List[str]]:
+        """Уникальные значения ТУ, ТВ и ИВ в порядке первого появления
+
+        ТУ - непустые значения колонки управления, ТВ и ИВ - значения колонок ведения,
+        разбитые через запятую; значения с признаком (И)/(ИВ) относятся к ИВ без признака.
+        """
+        control = survey_df[control_col].dropna().astype(str).str.strip()
+        unique_control = control[control != ''].unique().tolist()
+
+        operation = ExcelService.split_series(
+            pd.concat([survey_df[col] for col in operation_cols], ignore_index=True)
+        )
+        lowered = operation.str.lower()
+        is_iv = lowered.str.contains('(и)', regex=False) | lowered.str.contains('(ив)', regex=False)
+
+        unique_operation = operation[~is_iv].unique().tolist()
+        unique_iv = (
+            operation[is_iv]
+            .str.replace(normalization_pipeline.iv_marker, '', regex=True)
+            .str.strip()
+            .unique()
+            .tolist()
+        )
+        return unique_control, unique_operation, unique_iv
+
+    @staticmethod
+    def build_roles_dict(roles_df: pd.DataFrame, role_col: str, uid_col: str) -> Tuple[Dict[str, str], List[str]]:
+        """Словарь роль -> UID и список названий ролей в порядке справочника"""
+        roles = roles_df.dropna(subset=[role_col])
+        role_names = roles[role_col].astype(str).str.strip()
+        uids = roles[uid_col].astype(str).str.strip()
+        return dict(zip(role_names, uids)), role_names.tolist()
+
     @staticmethod
     def apply_replacements(text: str, replacements: List[Dict]) -> str:
         """Применение замен к тексту"""
@@ -50,24 +351,13 @@ class ExcelService:
     @staticmethod
     def clean_name(name: str) -> str:
         """Очистка названия от общих слов для более точного сравнения"""
-        name = str(name).strip()
-        # Удаляем кавычки
-        name = re.sub(r'[\"\'«»]', '', name)
-        # Удаляем общие технические термины (регистронезависимо)
-        # Используем более точные паттерны чтобы не удалять цифры
-        patterns = [
-            r'\b(ПС|подстанция|п/с|п\.с\.|П/С)\b',
-            r'\b(линия|кабель|ВЛ|КЛ)\b',
-            r'\b(кВ|кв|KV|kV)\b', 
-            r'\b(напряжение|электропередачи|ЭП)\b'
-        ]
-        
-        for pattern in patterns:
-            name = re.sub(pattern, '', name, flags=re.IGNORECASE)
-        
-        # Удаляем лишние пробелы и обрезаем
-        name = re.sub(r'\s+', ' ', name).strip()
-        return name
+        # Скомпилированные шаблоны и кэш результатов - в NormalizationPipeline
+        return normalization_pipeline.clean_name(name)
+
+    @staticmethod
+    def canonical_name(name: str) -> str:
+        """Канонический ключ названия: очистка clean_name, регистр и пробелы свернуты"""
+        return ' '.join(ExcelService.clean_name(name).casefold().split())
 
     @staticmethod
     def is_iv_role(val: str) -> bool:
@@ -78,5 +368,4 @@ class ExcelService:
     @staticmethod
     def extract_iv_base(val: str) -> str:
         """Удаляет (И) или (ИВ) из строки и возвращает основу"""
-        val_clean = re.sub(r'\s*\(И[В]?\)', '', str(val), flags=re.IGNORECASE)
-        return val_clean.strip()
\ No newline at end of file
+        return normalization_pipeline.extract_iv_base(val)
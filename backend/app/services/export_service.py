@@ -1,53 +1,65 @@
 import pandas as pd
-from io import BytesIO
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.utils import get_column_letter
+from typing import BinaryIO, List
 import logging
 
 logger = logging.getLogger(__name__)
 
 class ExportService:
+    HIGHLIGHT_FILL = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+    MAX_COLUMN_WIDTH = 50
+
+    @staticmethod
+    def column_widths(df: pd.DataFrame) -> List[int]:
+        """Ширина колонок по самому длинному значению или заголовку (векторно, без обхода ячеек)"""
+        widths = []
+        for position, column in enumerate(df.columns):
+            values = df.iloc[:, position].dropna()
+            longest = int(values.astype(str).str.len().max()) if len(values) else 0
+            widths.append(min(max(longest, len(str(column))) + 2, ExportService.MAX_COLUMN_WIDTH))
+        return widths
+
+    @staticmethod
+    def write_result_excel(df: pd.DataFrame, highlight_rows: list, output: BinaryIO):
+        """Потоковая запись результата в output (режим write_only openpyxl)
+
+        Строки уходят в файл по мере записи, книга целиком в памяти не строится.
+        highlight_rows - позиции строк df, они заливаются желтым; пустые ячейки
+        (NaN) записываются пустыми.
+        """
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Результат")
+
+        # Ширина задается до первой строки - в режиме write_only потом ее не изменить
+        for position, width in enumerate(ExportService.column_widths(df), 1):
+            ws.column_dimensions[get_column_letter(position)].width = width
+
+        ws.append([str(column) for column in df.columns])
+
+        highlighted = set(highlight_rows)
+        values = df.astype(object).where(df.notna(), None)
+        for position, row in enumerate(values.itertuples(index=False, name=None)):
+            if position in highlighted:
+                cells = []
+                for value in row:
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.fill = ExportService.HIGHLIGHT_FILL
+                    cells.append(cell)
+                ws.append(cells)
+            else:
+                ws.append(row)
+
+        wb.save(output)
+
+    @staticmethod
+    def write_result_csv(df: pd.DataFrame, output: BinaryIO):
+        """Результат в CSV (UTF-8 с BOM - корректно открывается в Excel); подсветки нет"""
+        df.to_csv(output, index=False, encoding="utf-8-sig")
+
     @staticmethod
-    def create_result_excel(df: pd.DataFrame, highlight_rows: list, 
-                          tu_summary: dict, tv_summary: dict, iv_summary: dict) -> BytesIO:
-        """Создание Excel файла с результатами (миграция из Streamlit)"""
-        try:
-            logger.info("Создание Excel файла с результатами")
-            output = BytesIO()
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Результат"
-
-            # Запись данных
-            for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=True), 1):
-                for c_idx, value in enumerate(row, 1):
-                    cell = ws.cell(row=r_idx, column=c_idx)
-                    cell.value = value
-
-            # Подсветка строк (миграция логики из Streamlit)
-            yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-            for row_idx in highlight_rows:
-                for col in range(1, ws.max_column + 1):
-                    ws.cell(row=row_idx + 2, column=col).fill = yellow_fill
-
-            # Автоподбор ширины колонок
-            for col in ws.columns:
-                max_length = 0
-                col_letter = col[0].column_letter
-                for cell in col:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                ws.column_dimensions[col_letter].width = min(max_length + 2, 50)
-
-            wb.save(output)
-            output.seek(0)
-            logger.info("Excel файл с результатами успешно создан")
-            return output.getvalue()
-            
-        except Exception as e:
-            logger.error(f"Ошибка создания Excel: {e}")
-            raise
\ No newline at end of file
+    def write_result_parquet(df: pd.DataFrame, output: BinaryIO):
+        """Результат в Parquet для загрузчиков, читающих колоночные файлы напрямую; подсветки нет"""
+        df.to_parquet(output, index=False)
@@ -0,0 +1,107 @@
+from typing import Any, Dict, Optional
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from ..core.config import settings
+from ..core.storage import ensure_private_dir
+
+logger = logging.getLogger(__name__)
+
+class JobStore:
+    """Статус и результат фоновых задач анализа на локальном диске, ключ - job_id.
+
+    Задача выполняется в процессе uvicorn, который ее принял, а опрос статуса и отмена
+    приходят в любой процесс. Поэтому процесс-владелец пишет снимок задачи JSON-файлом
+    в общий каталог при каждой смене статуса (и периодически - с прогрессом), остальные
+    процессы читают его. Отмена из другого процесса - файл-метка, которую владелец
+    проверяет на границах этапов. Файлы старше TTL удаляются. Пустой каталог - хранилище
+    отключено, задачи доступны только в принявшем их процессе.
+    """
+
+    _ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+    def __init__(self, directory: str, ttl_seconds: int, cleanup_interval: int = 60):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.cleanup_interval = cleanup_interval
+        self._last_cleanup = 0.0
+        self._lock = threading.Lock()
+        if directory:
+            ensure_private_dir(directory)
+
+    def _path(self, job_id: str, suffix: str = ".json") -> Optional[str]:
+        if not self.directory or not self._ID_PATTERN.match(job_id):
+            return None
+        return os.path.join(self.directory, f"{job_id}{suffix}")
+
+    def put(self, snapshot: Dict[str, Any]):
+        """Атомарная запись снимка задачи"""
+        path = self._path(snapshot["job_id"])
+        if path is None:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Не удалось сохранить задачу анализа {snapshot['job_id']}: {e}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.cleanup()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Снимок задачи; None - нет, устарел или хранилище отключено"""
+        path = self._path(job_id)
+        if path is None:
+            return None
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def request_cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Метка отмены для процесса-владельца; возвращает текущий снимок задачи"""
+        snapshot = self.get(job_id)
+        if snapshot is None:
+            return None
+        try:
+            with open(self._path(job_id, ".cancel"), "w", encoding="utf-8"):
+                pass
+        except OSError as e:
+            logger.warning(f"Не удалось отменить задачу анализа {job_id}: {e}")
+        return snapshot
+
+    def cancel_requested(self, job_id: str) -> bool:
+        path = self._path(job_id, ".cancel")
+        return path is not None and os.path.exists(path)
+
+    def cleanup(self, force: bool = False):
+        """Удаление снимков и меток отмены старше TTL"""
+        with self._lock:
+            now = time.time()
+            if not self.directory or (not force and now - self._last_cleanup < self.cleanup_interval):
+                return
+            self._last_cleanup = now
+
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith((".json", ".cancel")):
+                continue
+            try:
+                if now - entry.stat().st_mtime > self.ttl_seconds:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+job_store = JobStore(
+    directory=settings.ANALYSIS_JOB_DIR,
+    ttl_seconds=settings.ANALYSIS_JOB_TTL_SECONDS
+)
@@ -0,0 +1,207 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import uuid
+from .matching_service import MatchingService
+from .role_index import RoleIndex
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Состояние процесса-исполнителя: индексы ролей последних анализов по ключу
+_WORKER_INDEX_LIMIT = 4
+_worker_role_indexes: "OrderedDict[str, RoleIndex]" = OrderedDict()
+_worker_matching_service: Optional[MatchingService] = None
+_worker_index_dir: Optional[str] = None
+
+def _index_path(index_dir: str, index_key: str) -> str:
+    return os.path.join(index_dir, f"{index_key}.pickle")
+
+def _init_worker(index_dir: str):
+    global _worker_matching_service, _worker_index_dir
+    _worker_matching_service = MatchingService()
+    _worker_index_dir = index_dir
+
+def _worker_role_index(index_key: str) -> RoleIndex:
+    role_index = _worker_role_indexes.get(index_key)
+    if role_index is None:
+        # Индекс читается из файла один раз на процесс, задачи передают только ключ
+        with open(_index_path(_worker_index_dir, index_key), "rb") as f:
+            role_index = pickle.load(f)
+        _worker_role_indexes[index_key] = role_index
+        while len(_worker_role_indexes) > _WORKER_INDEX_LIMIT:
+            _worker_role_indexes.popitem(last=False)
+    _worker_role_indexes.move_to_end(index_key)
+    return role_index
+
+def _match_chunk(index_key: str, role_type: str, values: List[str],
+                 threshold: int, top_k: Optional[int]) -> List[Dict[str, Any]]:
+    # Параллельность дает сам пул, скорер внутри процесса работает в один поток
+    return _worker_matching_service.find_similar_matches_batch(
+        values, role_type, _worker_role_index(index_key),
+        threshold=threshold, top_k=top_k, workers=1
+    )
+
+class MatchingExecutor:
+    """Параллельный нечеткий поиск значений ТУ/ТВ/ИВ в пуле процессов.
+
+    Значения всех типов делятся на порции, порции выполняются в пуле, результаты
+    собираются в порядке отправки - итог не зависит от порядка завершения задач.
+    Пул создается при первом параллельном поиске и живет до shutdown(), поэтому
+    процессы запускаются один раз. Индекс ролей сериализуется один раз на поиск в файл
+    закрытого каталога пула, задачи передают только ключ индекса: процесс читает файл
+    при первой встрече ключа и хранит несколько последних индексов.
+    """
+
+    def __init__(self, pool_size: Optional[int] = None, chunk_size: Optional[int] = None,
+                 min_values: Optional[int] = None):
+        self.pool_size = settings.MATCH_POOL_SIZE if pool_size is None else pool_size
+        self.chunk_size = settings.MATCH_POOL_CHUNK_SIZE if chunk_size is None else chunk_size
+        self.min_values = settings.MATCH_POOL_MIN_VALUES if min_values is None else min_values
+        self.matching_service = MatchingService()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._index_dir: Optional[str] = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def max_workers(self) -> int:
+        return self.pool_size or os.cpu_count() or 1
+
+    def _workers_for(self, total: int) -> int:
+        return max(1, min(self.max_workers, -(-total // self.chunk_size)))
+
+    def _get_pool(self) -> Tuple[ProcessPoolExecutor, str]:
+        """Пул и каталог файлов индексов ролей для его процессов"""
+        with self._pool_lock:
+            if self._pool is None:
+                logger.info(f"Запуск пула сопоставления: {self.max_workers} процессов")
+                self._index_dir = tempfile.mkdtemp(prefix="role_index_")
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._mp_context(),
+                                                 initializer=_init_worker, initargs=(self._index_dir,))
+            return self._pool, self._index_dir
+
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        """Сломанный пул (процесс завершился аварийно) заменяется новым при следующем поиске"""
+        index_dir = None
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool, index_dir, self._index_dir = None, self._index_dir, None
+        pool.shutdown(wait=False, cancel_futures=True)
+        if index_dir is not None:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+    def shutdown(self):
+        """Остановка пула процессов (при остановке приложения)"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+            index_dir, self._index_dir = self._index_dir, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        if index_dir is not None:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+    @staticmethod
+    def _mp_context():
+        # forkserver не наследует потоки и блокировки веб-сервера; на Windows доступен только spawn
+        methods = multiprocessing.get_all_start_methods()
+        return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+    def match(
+        self,
+        values_by_type: Dict[str, Iterable[str]],
+        role_index: RoleIndex,
+        threshold: int = 60,
+        top_k: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Поиск кандидатов для значений всех типов, результат в формате pending_matches"""
+        values_by_type = {role_type: list(values) for role_type, values in values_by_type.items()}
+        results: Dict[str, List[Dict[str, Any]]] = {role_type: [] for role_type in values_by_type}
+        for role_type, items in self.iter_match(values_by_type, role_index, threshold, top_k, progress):
+            results[role_type].extend(items)
+        return results
+
+    def iter_match(
+        self,
+        values_by_type: Dict[str, Iterable[str]],
+        role_index: RoleIndex,
+        threshold: int = 60,
+        top_k: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Результаты по порциям (тип, элементы pending_matches) в порядке значений
+
+        progress(обработано, всего) вызывается после каждой порции. Исключение из progress
+        (например, отмена задачи) или закрытие генератора прерывает поиск, еще не начатые
+        порции отменяются.
+        """
+        values_by_type = {role_type: list(values) for role_type, values in values_by_type.items()}
+        total = sum(len(values) for values in values_by_type.values())
+        workers = self._workers_for(total)
+        chunks = [
+            (role_type, values[start:start + self.chunk_size])
+            for role_type, values in values_by_type.items()
+            for start in range(0, len(values), self.chunk_size)
+        ]
+        done = 0
+
+        if workers <= 1 or total < self.min_values:
+            # Значения сравниваются независимо, поэтому порции не меняют результат
+            for role_type, chunk in chunks:
+                items = self.matching_service.find_similar_matches_batch(
+                    chunk, role_type, role_index, threshold=threshold, top_k=top_k
+                )
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, total)
+                yield role_type, items
+            return
+
+        logger.info(f"Параллельное сопоставление: {total} значений, {len(chunks)} порций")
+        pool, index_dir = self._get_pool()
+        index_key = uuid.uuid4().hex
+        index_path = _index_path(index_dir, index_key)
+        futures = []
+        try:
+            self._write_index(role_index, index_path)
+            futures = [
+                (role_type, len(chunk), pool.submit(_match_chunk, index_key, role_type, chunk, threshold, top_k))
+                for role_type, chunk in chunks
+            ]
+            for role_type, size, future in futures:
+                items = future.result()
+                done += size
+                if progress is not None:
+                    progress(done, total)
+                yield role_type, items
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise
+        except BaseException:
+            for _, _, future in futures:
+                future.cancel()
+            raise
+        finally:
+            # Процессы, уже прочитавшие индекс, держат его в памяти до вытеснения
+            try:
+                os.remove(index_path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _write_index(role_index: RoleIndex, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(role_index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+# Общий пул приложения: используется анализом в запросах и фоновыми задачами
+matching_executor = MatchingExecutor()
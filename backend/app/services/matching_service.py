@@ -1,8 +1,15 @@
 from fuzzywuzzy import fuzz
-from typing import List, Tuple, Dict, Any
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
+from typing import List, Tuple, Dict, Any, Callable, Iterable, Iterator, Optional, Union
 import logging
+import re
+import numpy as np
 import pandas as pd  # Добавляем импорт pandas
 from .excel_service import ExcelService
+from .role_index import RoleIndex
+from .ngram_index import NGramIndex
+from ..core.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -10,26 +17,22 @@ class MatchingService:
     def __init__(self):
         self.excel_service = ExcelService()
 
-    def find_similar_matches(self, value: str, role_type: str, role_list: List[str], threshold: int = 60) -> List[Tuple[str, int]]:
-        """Поиск похожих ролей с порогом совпадения"""
+    def find_similar_matches(self, value: str, role_type: str, role_list: Union[List[str], RoleIndex], threshold: int = 60) -> List[Tuple[str, int]]:
+        """Поиск похожих ролей с порогом совпадения
+
+        role_list может быть готовым RoleIndex - тогда роли не очищаются повторно.
+        """
         logger.debug(f"Поиск похожих для '{value}' (тип: {role_type}), порог: {threshold}%")
         
         if not value.strip():
             return []
 
+        role_index = role_list if isinstance(role_list, RoleIndex) else RoleIndex(role_list)
         cleaned_value = self.excel_service.clean_name(value)
-        prefix = "ТУ" if role_type == "TU" else "ТВ" if role_type == "TV" else "ИВ"
-
-        def compare_role(candidate_role: str) -> int:
-            if not candidate_role.startswith(prefix + " "):
-                return 0
-            role_part = candidate_role[len(prefix)+1:].strip()
-            cleaned_role_part = self.excel_service.clean_name(role_part)
-            return fuzz.ratio(cleaned_value, cleaned_role_part)
 
         results = []
-        for role in role_list:
-            score = compare_role(role)
+        for role, cleaned_role_part in zip(role_index.roles(role_type), role_index.cleaned(role_type)):
+            score = fuzz.ratio(cleaned_value, cleaned_role_part)
             if score >= threshold:
                 results.append((role, score))
 
@@ -37,6 +40,248 @@ class MatchingService:
         logger.debug(f"Найдено {len(results)} вариантов для '{value}'")
         return results
 
+    def find_similar_matches_batch(
+        self,
+        values: Iterable[str],
+        role_type: str,
+        role_list: Union[List[str], RoleIndex],
+        threshold: int = 60,
+        top_k: Optional[int] = None,
+        use_ngram_index: Optional[bool] = None,
+        workers: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Пакетный поиск похожих ролей для списка значений одного типа
+
+        Матрица сходства (значения × роли) считается блоками через rapidfuzz.process.cdist
+        на всех ядрах. Оценки совпадают с fuzz.ratio: нормированное Indel-сходство,
+        округленное до целого. Порог и top_k применяются внутри скорера.
+        С use_ngram_index (по умолчанию MATCH_NGRAM_PRUNING) блоки сравниваются только
+        с кандидатами из NGramIndex - результат тот же.
+        workers - потоки скорера (по умолчанию MATCH_WORKERS).
+        Возвращает элементы pending_matches только для значений с кандидатами.
+        """
+        role_index = role_list if isinstance(role_list, RoleIndex) else RoleIndex(role_list)
+        roles = role_index.roles(role_type)
+        cleaned_roles = role_index.cleaned(role_type)
+
+        values = [val for val in values if val.strip()]
+        if not values or not roles:
+            return []
+
+        cleaned_values = [self.excel_service.clean_name(val) for val in values]
+        if use_ngram_index is None:
+            use_ngram_index = settings.MATCH_NGRAM_PRUNING
+        if workers is None:
+            workers = settings.MATCH_WORKERS
+
+        if use_ngram_index:
+            scored = self._score_pruned(cleaned_values, cleaned_roles,
+                                        role_index.ngram_index(role_type, settings.MATCH_NGRAM_SIZE), threshold, workers)
+        else:
+            scored = self._score_matrix(cleaned_values, cleaned_roles, threshold, workers)
+
+        pending = []
+        for position, (candidates, scores) in enumerate(scored):
+            keep = scores >= threshold
+            candidates, scores = candidates[keep], scores[keep]
+            if candidates.size == 0:
+                continue
+            # Стабильная сортировка сохраняет порядок справочника при равных оценках
+            order = np.argsort(-scores, kind="stable")
+            if top_k is not None:
+                order = order[:top_k]
+            pending.append({
+                "original": values[position],
+                "candidates": [
+                    {"role_name": roles[candidates[i]], "score": int(scores[i])} for i in order
+                ]
+            })
+
+        logger.debug(f"Пакетный поиск ({role_type}): {len(pending)} из {len(values)} значений с кандидатами")
+        return pending
+
+    @staticmethod
+    def _cdist_scores(cleaned_values: List[str], cleaned_roles: List[str], threshold: int,
+                      workers: int) -> np.ndarray:
+        """Целочисленные оценки fuzz.ratio для матрицы значения × роли"""
+        # Отсечка с запасом в 1%: окончательно порог проверяется после округления
+        similarity = process.cdist(
+            cleaned_values, cleaned_roles,
+            scorer=Indel.normalized_similarity,
+            score_cutoff=max(threshold - 1, 0) / 100,
+            dtype=np.float64,
+            workers=workers
+        )
+        return np.rint(similarity * 100).astype(np.int64)
+
+    def _score_matrix(self, cleaned_values: List[str], cleaned_roles: List[str], threshold: int, workers: int):
+        """Полный перебор блоками матрицы сходства"""
+        all_roles = np.arange(len(cleaned_roles))
+        block_size = max(1, settings.MATCH_BATCH_CELLS // len(cleaned_roles))
+        for start in range(0, len(cleaned_values), block_size):
+            block = cleaned_values[start:start + block_size]
+            for row in self._cdist_scores(block, cleaned_roles, threshold, workers):
+                yield all_roles, row
+
+    def _score_pruned(self, cleaned_values: List[str], cleaned_roles: List[str],
+                      ngram_index: NGramIndex, threshold: int, workers: int):
+        """Сравнение блока значений только с объединением их кандидатов из n-граммного индекса
+
+        Отбор кандидатов не теряет ролей выше порога, поэтому сравнение с объединением
+        кандидатов блока дает тот же результат. Блок считается одной матрицей на всех
+        ядрах; если объединение больше MATCH_NGRAM_MAX_SHORTLIST ролей, блок сравнивается
+        со всеми ролями - отбор не окупается.
+        """
+        all_roles = np.arange(len(cleaned_roles))
+        max_shortlist = settings.MATCH_NGRAM_MAX_SHORTLIST * len(cleaned_roles)
+        block_size = max(1, settings.MATCH_BATCH_CELLS // len(cleaned_roles))
+        for start in range(0, len(cleaned_values), block_size):
+            block = cleaned_values[start:start + block_size]
+            selected = np.zeros(len(cleaned_roles), dtype=bool)
+            for cleaned_value in block:
+                selected[ngram_index.candidates(cleaned_value, threshold)] = True
+                if selected.sum() > max_shortlist:
+                    # Отбор уже не окупается - остальные значения блока не проверяются
+                    break
+            shortlist = all_roles if selected.sum() > max_shortlist else np.flatnonzero(selected)
+            if shortlist.size == 0:
+                for _ in block:
+                    yield shortlist, np.empty(0, dtype=np.int64)
+                continue
+            shortlist_roles = [cleaned_roles[i] for i in shortlist]
+            for row in self._cdist_scores(block, shortlist_roles, threshold, workers):
+                yield shortlist, row
+
+    def cluster_values(self, values: Iterable[str], threshold: Optional[int] = None) -> List[List[str]]:
+        """Группировка вариантов написания одного объекта
+
+        Значения с одинаковым clean_name всегда попадают в одну группу. Затем группы
+        объединяются, если их канонические формы содержат одни и те же числа и похожи
+        не меньше чем на threshold % (жадно, более короткие формы становятся лидерами). Первый элемент группы -
+        представитель, по которому выполняется поиск.
+        """
+        threshold = settings.MATCH_CLUSTER_THRESHOLD if threshold is None else threshold
+
+        by_cleaned: Dict[str, List[str]] = {}
+        for val in values:
+            if val.strip():
+                by_cleaned.setdefault(self.excel_service.clean_name(val), []).append(val)
+
+        forms = sorted(by_cleaned, key=lambda form: (len(form), form))
+        leaders: List[str] = []
+        # Номера (110, 2, ...) обозначают разные объекты: сравниваются только формы с одинаковыми числами
+        buckets: Dict[Tuple[str, ...], Tuple[List[str], List[str]]] = {}
+        clusters: Dict[str, List[str]] = {}
+        for form in forms:
+            canonical = self.excel_service.canonical_name(form)
+            bucket_leaders, bucket_forms = buckets.setdefault(tuple(re.findall(r'\d+', canonical)), ([], []))
+            leader = None
+            if threshold < 100 and bucket_forms:
+                best = process.extractOne(
+                    canonical, bucket_forms,
+                    scorer=Indel.normalized_similarity,
+                    score_cutoff=threshold / 100
+                )
+                if best is not None:
+                    leader = bucket_leaders[best[2]]
+            if leader is None:
+                leader = form
+                leaders.append(form)
+                bucket_leaders.append(form)
+                bucket_forms.append(canonical)
+                clusters[form] = []
+            clusters[leader].extend(by_cleaned[form])
+
+        return [clusters[leader] for leader in leaders]
+
+    def match_unique_values(
+        self,
+        unique_values: Dict[str, Iterable[str]],
+        role_index: RoleIndex,
+        threshold: Optional[int] = None,
+        top_k: Optional[int] = None,
+        cluster_threshold: Optional[int] = None,
+        executor=None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Нечеткое сопоставление всех уникальных значений ТУ/ТВ/ИВ
+
+        Ищется только представитель каждой группы вариантов написания (cluster_values),
+        его кандидаты раздаются всем членам группы. При cluster_threshold 100 (по умолчанию)
+        члены группы совпадают после очистки и результат равен поиску по каждому значению;
+        при меньшем пороге оценки членов группы приближенные. С executor (MatchingExecutor)
+        поиск представителей выполняется в пуле процессов. progress(обработано, всего)
+        сообщает число уже найденных представителей.
+        Возвращает структуру pending_matches: {"TU": [...], "TV": [...], "IV": [...]}.
+        """
+        pending_matches = {"TU": [], "TV": [], "IV": []}
+        for role_type, items in self.iter_match_unique_values(
+            unique_values, role_index, threshold, top_k, cluster_threshold, executor, progress
+        ):
+            pending_matches[role_type].extend(items)
+        return pending_matches
+
+    def iter_match_unique_values(
+        self,
+        unique_values: Dict[str, Iterable[str]],
+        role_index: RoleIndex,
+        threshold: Optional[int] = None,
+        top_k: Optional[int] = None,
+        cluster_threshold: Optional[int] = None,
+        executor=None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """То же, что match_unique_values, но по частям: (тип, элементы pending_matches)
+
+        Части выдаются по мере готовности порций поиска (с executor) или типов ролей;
+        их объединение в порядке выдачи равно результату match_unique_values.
+        """
+        threshold = settings.MATCH_THRESHOLD if threshold is None else threshold
+        top_k = settings.MATCH_TOP_K if top_k is None else top_k
+
+        clusters = {
+            role_type: self.cluster_values(values, cluster_threshold)
+            for role_type, values in unique_values.items()
+        }
+        representatives = {
+            role_type: [cluster[0] for cluster in type_clusters]
+            for role_type, type_clusters in clusters.items()
+        }
+        members = {
+            role_type: {cluster[0]: cluster for cluster in type_clusters}
+            for role_type, type_clusters in clusters.items()
+        }
+        for role_type, type_clusters in clusters.items():
+            logger.debug(f"{role_type}: {len(type_clusters)} групп для поиска")
+
+        if executor is not None:
+            found_chunks = executor.iter_match(
+                representatives, role_index, threshold=threshold, top_k=top_k, progress=progress
+            )
+        else:
+            found_chunks = self._iter_found_by_type(representatives, role_index, threshold, top_k, progress)
+
+        for role_type, found_items in found_chunks:
+            yield role_type, [
+                {"original": member, "candidates": item["candidates"]}
+                for item in found_items if item["candidates"]
+                for member in members[role_type][item["original"]]
+            ]
+
+    def _iter_found_by_type(self, representatives: Dict[str, List[str]], role_index: RoleIndex,
+                            threshold: int, top_k: Optional[int],
+                            progress: Optional[Callable[[int, int], None]]):
+        total = sum(len(values) for values in representatives.values())
+        done = 0
+        for role_type, values in representatives.items():
+            found = self.find_similar_matches_batch(
+                values, role_type, role_index, threshold=threshold, top_k=top_k
+            )
+            done += len(values)
+            if progress is not None:
+                progress(done, total)
+            yield role_type, found
+
     def analyze_data(
         self, 
         survey_data: Dict[str, pd.DataFrame],
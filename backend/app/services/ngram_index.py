@@ -0,0 +1,85 @@
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence, Tuple
+import math
+import numpy as np
+
+class NGramIndex:
+    """Инвертированный индекс символьных n-грамм по очищенным названиям ролей.
+
+    Используется для отбора кандидатов перед нечетким сравнением. Отсев делается
+    только по необходимым условиям достижения порога, поэтому итоговый результат
+    совпадает с полным перебором.
+
+    Оценка fuzz.ratio равна round(100 * 2M / (L1 + L2)), где M - длина наибольшей
+    общей подпоследовательности. Отсюда:
+    - фильтр по длине: M <= min(L1, L2);
+    - фильтр по n-граммам: у строк с общей подпоследовательностью длины M совпадает
+      не меньше (L1 - n + 1) - n * (L1 - M) - (n - 1) * (L2 - M) n-грамм.
+
+    При пороге 60 граммный фильтр содержателен только для n = 1 (общие символы),
+    для n >= 2 он начинает отсекать при более высоких порогах.
+    """
+
+    def __init__(self, names: Sequence[str], n: int = 1):
+        if n < 1:
+            raise ValueError("n must be >= 1")
+        self.n = n
+        self.size = len(names)
+        lengths = np.fromiter((len(name) for name in names), dtype=np.int64, count=len(names))
+
+        # Роли упорядочены по длине, чтобы окно допустимых длин бралось двоичным поиском
+        self._order = np.argsort(lengths, kind="stable")
+        self._lengths = lengths[self._order]
+
+        postings: Dict[str, Tuple[List[int], List[int]]] = defaultdict(lambda: ([], []))
+        for position, role_id in enumerate(self._order):
+            for gram, count in self._grams(names[role_id]).items():
+                ids, counts = postings[gram]
+                ids.append(position)
+                counts.append(count)
+
+        self._postings = {
+            gram: (np.asarray(ids, dtype=np.int64), np.asarray(counts, dtype=np.int64))
+            for gram, (ids, counts) in postings.items()
+        }
+
+    def _grams(self, text: str) -> Counter:
+        n = self.n
+        return Counter(text[i:i + n] for i in range(len(text) - n + 1))
+
+    def candidates(self, text: str, threshold: int) -> np.ndarray:
+        """Индексы ролей (в исходном порядке), которые могут набрать порог с text"""
+        if self.size == 0:
+            return np.empty(0, dtype=np.int64)
+        if threshold <= 0:
+            return np.arange(self.size)
+
+        length = len(text)
+        # round(100 * sim) >= threshold требует 100 * sim >= threshold - 0.5
+        min_ratio = (threshold - 0.5) / 100
+        if min_ratio > 1:
+            return np.empty(0, dtype=np.int64)
+
+        # Окно длин из условия 2 * min(L1, L2) / (L1 + L2) >= min_ratio
+        low = math.ceil(length * min_ratio / (2 - min_ratio) - 1e-9)
+        high = math.floor(length * (2 - min_ratio) / min_ratio + 1e-9)
+        start = int(np.searchsorted(self._lengths, low, side="left"))
+        stop = int(np.searchsorted(self._lengths, high, side="right"))
+        if start >= stop:
+            return np.empty(0, dtype=np.int64)
+
+        shared = np.zeros(self.size, dtype=np.int64)
+        for gram, count in self._grams(text).items():
+            posting = self._postings.get(gram)
+            if posting is not None:
+                ids, counts = posting
+                shared[ids] += np.minimum(counts, count)
+
+        role_lengths = self._lengths[start:stop]
+        min_common = np.ceil(min_ratio * (length + role_lengths) / 2 - 1e-9)
+        min_common = np.maximum(min_common, 0)
+        n = self.n
+        required = (length - n + 1) - n * (length - min_common) - (n - 1) * (role_lengths - min_common)
+
+        mask = (min_common <= np.minimum(length, role_lengths)) & (shared[start:stop] >= required)
+        return np.sort(self._order[start:stop][mask])
@@ -0,0 +1,62 @@
+from functools import lru_cache
+from typing import Dict, Iterable
+import re
+from ..core.config import settings
+
+class NormalizationPipeline:
+    """Нормализация названий объектов для сравнения (основа ExcelService.clean_name).
+
+    Все регулярные выражения компилируются один раз, четыре группы общих технических
+    терминов объединены в одно выражение - один проход вместо четырех. Результаты
+    очистки запоминаются в ограниченном LRU-кэше. Список терминов расширяется через
+    settings.NORMALIZATION_EXTRA_NOISE_WORDS без изменения кода.
+    """
+
+    # Общие технические термины (регистронезависимо), группы исходного clean_name
+    NOISE_PATTERNS = [
+        r'ПС|подстанция|п/с|п\.с\.|П/С',
+        r'линия|кабель|ВЛ|КЛ',
+        r'кВ|кв|KV|kV',
+        r'напряжение|электропередачи|ЭП',
+    ]
+
+    def __init__(self, extra_noise_words: Iterable[str] = (), cache_size: int = 100_000):
+        # Границы слов не дают удалять части слов и цифры
+        noise = r'\b(?:' + '|'.join(self.NOISE_PATTERNS) + r')\b'
+        extra = [re.escape(word.strip()) for word in extra_noise_words if word.strip()]
+        if extra:
+            # Пользовательские слова могут начинаться или заканчиваться не буквой, поэтому \b не подходит
+            noise += r'|(?<!\w)(?:' + '|'.join(extra) + r')(?!\w)'
+
+        self._quotes = re.compile(r'[\"\'«»]')
+        self._noise = re.compile(noise, re.IGNORECASE)
+        self._spaces = re.compile(r'\s+')
+        self.iv_marker = re.compile(r'\s*\(И[В]?\)', re.IGNORECASE)
+        self._clean_cached = lru_cache(maxsize=cache_size)(self._clean)
+
+    def _clean(self, name: str) -> str:
+        name = name.strip()
+        name = self._quotes.sub('', name)
+        name = self._noise.sub('', name)
+        return self._spaces.sub(' ', name).strip()
+
+    def clean_name(self, name: str) -> str:
+        """Очистка названия от кавычек и общих слов"""
+        return self._clean_cached(str(name))
+
+    def extract_iv_base(self, val: str) -> str:
+        """Удаление признака (И)/(ИВ) из строки"""
+        return self.iv_marker.sub('', str(val)).strip()
+
+    def cache_info(self) -> Dict[str, int]:
+        """Счетчики кэша очистки: попадания, промахи, текущий и максимальный размер"""
+        info = self._clean_cached.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+
+    def cache_clear(self):
+        self._clean_cached.cache_clear()
+
+normalization_pipeline = NormalizationPipeline(
+    extra_noise_words=settings.NORMALIZATION_EXTRA_NOISE_WORDS,
+    cache_size=settings.NORMALIZATION_CACHE_SIZE
+)
@@ -0,0 +1,125 @@
+from typing import Any, Dict, List
+import logging
+import pandas as pd
+from .excel_service import ExcelService
+from .normalization import normalization_pipeline
+
+logger = logging.getLogger(__name__)
+
+class ProcessingService:
+    """Применение сопоставлений ко всем строкам опроса (итог /process).
+
+    Сопоставления значений (автоматические из анализа и выбранные пользователем)
+    собираются в одну таблицу тип/значение -> роль/UID, значения строк опроса
+    разворачиваются (explode) и присоединяются к ней; роли и UID строк собираются
+    группировкой - без обхода строк в Python.
+    """
+
+    RESULT_COLUMNS = {"TU": "ТУ_роли", "TV": "ТВ_роли", "IV": "ИВ_роли"}
+    SUMMARY_COLUMN = "Сводка_роли"
+    SUMMARY_SEPARATOR = "!"  # UID в сводной колонке - формат импорта
+    MANUAL_MATCH = "manual"
+
+    @staticmethod
+    def build_resolution(auto_matches: Dict[str, List[Dict[str, Any]]],
+                         user_choices: Dict[str, Dict[str, str]],
+                         roles_dict: Dict[str, str]) -> pd.DataFrame:
+        """Таблица сопоставлений: type, value, role_name, uid, match_type
+
+        Выбор пользователя перекрывает автоматическое сопоставление. UID берется из
+        справочника ролей; роли, которых нет в справочнике, пропускаются.
+        """
+        rows = []
+        for role_type, matches in (auto_matches or {}).items():
+            rows.extend((role_type, match["original"], match["matched"], match.get("type", ""))
+                        for match in matches)
+        for role_type, choices in (user_choices or {}).items():
+            rows.extend((role_type, original, role_name, ProcessingService.MANUAL_MATCH)
+                        for original, role_name in choices.items() if role_name)
+
+        resolution = pd.DataFrame(rows, columns=["type", "value", "role_name", "match_type"])
+        resolution["uid"] = resolution["role_name"].map(roles_dict)
+        unknown = resolution["uid"].isna()
+        if unknown.any():
+            logger.warning(f"Пропущено {int(unknown.sum())} сопоставлений с ролями не из справочника")
+        return resolution[~unknown].drop_duplicates(["type", "value"], keep="last")
+
+    @staticmethod
+    def explode_values(survey_df: pd.DataFrame, control_col: str, operation_cols: List[str]) -> pd.DataFrame:
+        """Значения ТУ/ТВ/ИВ каждой строки: row (позиция строки), type, value
+
+        Правила те же, что в ExcelService.collect_unique_values.
+        """
+        survey_df = survey_df.reset_index(drop=True)
+        control = survey_df[control_col].dropna().astype(str).str.strip()
+        control = control[control != '']
+
+        operation = ExcelService.split_series(pd.concat([survey_df[col] for col in operation_cols]))
+        lowered = operation.str.lower()
+        is_iv = lowered.str.contains('(и)', regex=False) | lowered.str.contains('(ив)', regex=False)
+        iv = operation[is_iv].str.replace(normalization_pipeline.iv_marker, '', regex=True).str.strip()
+
+        parts = [
+            pd.DataFrame({"row": control.index, "type": "TU", "value": control.values}),
+            pd.DataFrame({"row": operation.index[~is_iv], "type": "TV", "value": operation[~is_iv].values}),
+            pd.DataFrame({"row": iv.index, "type": "IV", "value": iv.values}),
+        ]
+        values = pd.concat(parts, ignore_index=True)
+        # Порядок внутри строки: ТУ, затем значения колонок ведения слева направо
+        return values.sort_values("row", kind="stable", ignore_index=True)
+
+    @staticmethod
+    def join_by_row(rows: pd.Series, texts: pd.Series, size: int, separator: str = ", ") -> pd.Series:
+        """Склейка текстов через separator по позициям строк, строки без текстов - пустые
+
+        Склейка идет суммой строк в groupby (цикл внутри pandas), а не agg(separator.join),
+        который вызывает Python-функцию для каждой строки опроса.
+        """
+        joined = (texts + separator).groupby(rows.to_numpy()).sum().str[:-len(separator)]
+        return joined.reindex(range(size), fill_value="")
+
+    def process(self, survey_df: pd.DataFrame, control_col: str, operation_cols: List[str],
+                roles_dict: Dict[str, str], analysis_data: Dict[str, Any],
+                user_choices: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+        """Итоговая таблица, строки для подсветки и сводки по ТУ/ТВ/ИВ
+
+        Итоговая таблица - все колонки survey_df с добавленными колонками ролей
+        (RESULT_COLUMNS) и сводной колонкой UID. Подсвечиваются строки, где найдено меньше ролей, чем значений (есть
+        несопоставленные значения). Сводка - для каждого уникального значения:
+        role_name, found, uid, match_type.
+        """
+        resolution = self.build_resolution(analysis_data.get("auto_matches"), user_choices, roles_dict)
+        values = self.explode_values(survey_df, control_col, operation_cols)
+        merged = values.merge(resolution, on=["type", "value"], how="left", sort=False)
+        found = merged[merged["role_name"].notna()]
+
+        result = survey_df.reset_index(drop=True)
+        for role_type, column in self.RESULT_COLUMNS.items():
+            roles = found[found["type"] == role_type].drop_duplicates(["row", "role_name"])
+            result[column] = self.join_by_row(roles["row"], roles["role_name"], len(result)).values
+        uids = found.drop_duplicates(["row", "uid"])
+        result[self.SUMMARY_COLUMN] = self.join_by_row(
+            uids["row"], uids["uid"], len(result), self.SUMMARY_SEPARATOR
+        ).values
+
+        counts = merged.groupby("row").agg(total=("value", "size"), found=("role_name", "count"))
+        highlight_rows = counts.index[counts["total"] != counts["found"]].tolist()
+
+        summaries = {}
+        lookup = resolution.set_index(["type", "value"])
+        for role_type, unique_key in (("TU", "unique_tu"), ("TV", "unique_tv"), ("IV", "unique_iv")):
+            unique_values = analysis_data.get(unique_key)
+            if unique_values is None:
+                unique_values = values.loc[values["type"] == role_type, "value"].unique().tolist()
+            index = pd.MultiIndex.from_arrays([[role_type] * len(unique_values), unique_values])
+            matched = lookup.reindex(index)
+            summary = pd.DataFrame({
+                "role_name": matched["role_name"].fillna("").values,
+                "found": matched["role_name"].notna().values,
+                "uid": matched["uid"].fillna("").values,
+                "match_type": matched["match_type"].fillna("").values,
+            }, index=unique_values)
+            summaries[f"{role_type.lower()}_summary"] = summary.to_dict("index")
+
+        logger.info(f"Обработано {len(result)} строк, подсвечено {len(highlight_rows)}")
+        return {"data": result, "highlight_rows": highlight_rows, **summaries}
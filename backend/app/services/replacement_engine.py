@@ -0,0 +1,75 @@
+from typing import Dict, List, Tuple
+import re
+import pandas as pd
+
+def _overlaps(left: str, right: str) -> bool:
+    """Может ли вхождение left пересекаться с вхождением right (вложение или стык)"""
+    if left in right or right in left:
+        return True
+    shortest = min(len(left), len(right))
+    return any(
+        left.endswith(right[:size]) or right.endswith(left[:size])
+        for size in range(1, shortest)
+    )
+
+class ReplacementEngine:
+    """Скомпилированный список пользовательских замен.
+
+    Результат всегда совпадает с ExcelService.apply_replacements, который применяет
+    str.replace правило за правилом. Подряд идущие правила, которые не могут влиять
+    друг на друга, объединяются в одну стадию - одно регулярное выражение-альтернацию
+    и один проход по строке. Правило уходит в новую стадию, если его образец может
+    пересечься с образцом или результатом замены более раннего правила стадии.
+    """
+
+    def __init__(self, replacements: List[Dict]):
+        rules = []
+        for replacement in replacements:
+            old = replacement['old'].strip()
+            new = replacement['new'].strip()
+            if old:
+                rules.append((old, new))
+
+        stages: List[List[Tuple[str, str]]] = []
+        for old, new in rules:
+            stage = stages[-1] if stages else None
+            if stage is None or any(
+                _overlaps(old, prev_old) or _overlaps(old, prev_new) for prev_old, prev_new in stage
+            ):
+                stages.append([(old, new)])
+            else:
+                stage.append((old, new))
+
+        self._stages = [self._compile(stage) for stage in stages]
+
+    @staticmethod
+    def _compile(stage: List[Tuple[str, str]]):
+        if len(stage) == 1:
+            old, new = stage[0]
+            return lambda text: text.replace(old, new)
+
+        table = dict(stage)
+        # Длинные образцы первыми: при отсутствии вложений порядок не влияет на результат
+        pattern = re.compile('|'.join(re.escape(old) for old in sorted(table, key=len, reverse=True)))
+        return lambda text: pattern.sub(lambda match: table[match.group(0)], text)
+
+    @property
+    def stage_count(self) -> int:
+        return len(self._stages)
+
+    def apply(self, text: str) -> str:
+        """Применение замен к одной строке (семантика ExcelService.apply_replacements)"""
+        if not text or str(text).strip() == '':
+            return text
+
+        result = str(text)
+        for stage in self._stages:
+            result = stage(result)
+        return result
+
+    def apply_series(self, series: pd.Series) -> pd.Series:
+        """Применение замен к колонке: каждое различное значение обрабатывается один раз"""
+        if not self._stages:
+            return series
+        mapping = {value: self.apply(value) for value in series.unique()}
+        return series.map(mapping)
@@ -0,0 +1,148 @@
+from typing import Any, BinaryIO, Callable, Dict, Optional
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from ..core.config import settings
+from ..core.storage import ensure_private_dir
+
+logger = logging.getLogger(__name__)
+
+class ResultStore:
+    """Результаты /process на локальном диске, ключ - process_id.
+
+    Каждый результат - каталог с таблицей (Arrow IPC без сжатия) и meta.json (подсветка и сводки). Каталог общий для всех процессов uvicorn, поэтому
+    /download-result находит результат независимо от того, какой процесс выполнил
+    /process. Каталог результата пишется во временный и переименовывается целиком.
+    Результаты старше TTL удаляются, при превышении объема удаляются давно не
+    использованные. В каталоге результата можно хранить производные файлы (выгрузки).
+    """
+
+    DATA_FILE = "data.arrow"
+    META_FILE = "meta.json"
+    _ID_PATTERN = re.compile(r"^[A-Za-z0-9_]+$")
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: int, cleanup_interval: int = 60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.cleanup_interval = cleanup_interval
+        self._last_cleanup = 0.0
+        self._lock = threading.Lock()
+        ensure_private_dir(directory)
+
+    def path(self, process_id: str) -> Optional[str]:
+        """Каталог результата; None - недопустимый process_id"""
+        if not self._ID_PATTERN.match(process_id):
+            return None
+        return os.path.join(self.directory, process_id)
+
+    def put(self, process_id: str, df: pd.DataFrame, meta: Dict[str, Any]):
+        path = self.path(process_id)
+        if path is None:
+            raise ValueError(f"Invalid process_id: {process_id}")
+
+        tmp_dir = tempfile.mkdtemp(dir=self.directory, suffix=".tmp")
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            feather.write_feather(table, os.path.join(tmp_dir, self.DATA_FILE), compression="uncompressed")
+            with open(os.path.join(tmp_dir, self.META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(tmp_dir, path)
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.cleanup()
+
+    def get_meta(self, process_id: str) -> Optional[Dict[str, Any]]:
+        path = self.path(process_id)
+        if path is None:
+            return None
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                return None
+            with open(os.path.join(path, self.META_FILE), encoding="utf-8") as f:
+                meta = json.load(f)
+            os.utime(path)  # время доступа для вытеснения по давности использования
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    def get(self, process_id: str) -> Optional[Dict[str, Any]]:
+        """Таблица (ключ data) и meta результата; None - нет или устарел"""
+        meta = self.get_meta(process_id)
+        if meta is None:
+            return None
+        try:
+            table = feather.read_table(os.path.join(self.path(process_id), self.DATA_FILE), memory_map=True)
+        except FileNotFoundError:
+            return None
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"Не удалось прочитать результат {process_id}: {e}")
+            return None
+        df = table.to_pandas()
+        return {**meta, "data": df.where(df.notna(), np.nan)}
+
+    def file_path(self, process_id: str, name: str) -> Optional[str]:
+        """Путь к производному файлу результата, если результат и файл существуют"""
+        if self.get_meta(process_id) is None:
+            return None
+        path = os.path.join(self.path(process_id), name)
+        return path if os.path.exists(path) else None
+
+    def put_file(self, process_id: str, name: str, write: Callable[[BinaryIO], None]) -> str:
+        """Атомарная запись производного файла в каталог результата; возвращает путь"""
+        directory = self.path(process_id)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            path = os.path.join(directory, name)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def cleanup(self, force: bool = False):
+        """Удаление результатов старше TTL и самых давних при превышении объема"""
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_cleanup < self.cleanup_interval:
+                return
+            self._last_cleanup = now
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp") or not entry.is_dir():
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+            except OSError:
+                continue
+            if now - mtime > self.ttl_seconds:
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                entries.append((mtime, size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+result_store = ResultStore(
+    directory=settings.RESULT_STORE_DIR,
+    max_bytes=settings.RESULT_STORE_MAX_BYTES,
+    ttl_seconds=settings.RESULT_STORE_TTL_SECONDS
+)
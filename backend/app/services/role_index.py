@@ -0,0 +1,79 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import pandas as pd
+from .excel_service import ExcelService
+from .ngram_index import NGramIndex
+
+logger = logging.getLogger(__name__)
+
+class RoleIndex:
+    """Индекс справочника ролей, разбитый по типам ТУ/ТВ/ИВ.
+
+    Строится один раз на файл ролей: префикс проверяется и название
+    очищается через ExcelService.clean_name ровно один раз для каждой роли.
+    Дополнительно хранит словарь канонических ключей (ExcelService.canonical_name)
+    для точного сопоставления без нечеткого поиска.
+    """
+
+    PREFIXES = {"TU": "ТУ", "TV": "ТВ", "IV": "ИВ"}
+
+    def __init__(self, role_names: Iterable[str]):
+        self._roles: Dict[str, List[str]] = {role_type: [] for role_type in self.PREFIXES}
+        self._cleaned: Dict[str, List[str]] = {role_type: [] for role_type in self.PREFIXES}
+        self._canonical: Dict[str, Dict[str, Optional[str]]] = {role_type: {} for role_type in self.PREFIXES}
+        self._ngram_indexes: Dict[Tuple[str, int], NGramIndex] = {}
+
+        names = pd.Series(list(role_names), dtype=object)
+        for role_type, prefix in self.PREFIXES.items():
+            typed = names[names.str.startswith(prefix + " ", na=False)]
+            role_parts = typed.str[len(prefix) + 1:].str.strip()
+            self._roles[role_type] = typed.tolist()
+            self._cleaned[role_type] = role_parts.map(ExcelService.clean_name).tolist()
+            for role_part, role_name in zip(role_parts, typed):
+                self._add_canonical(role_type, role_part, role_name)
+
+        logger.debug(
+            "Индекс ролей построен: "
+            + ", ".join(f"{t}={len(r)}" for t, r in self._roles.items())
+        )
+
+    def _add_canonical(self, role_type: str, role_part: str, role_name: str):
+        key = ExcelService.canonical_name(role_part)
+        if not key:
+            return
+        canonical = self._canonical[role_type]
+        # Ключ, под который попадают разные роли, неоднозначен - его решает пользователь
+        if key in canonical and canonical[key] != role_name:
+            canonical[key] = None
+        else:
+            canonical[key] = role_name
+
+    @classmethod
+    def resolve_type(cls, role_type: str) -> str:
+        """Приведение типа роли к ключу индекса (неизвестные типы считаются ИВ)"""
+        return role_type if role_type in ("TU", "TV") else "IV"
+
+    def roles(self, role_type: str) -> List[str]:
+        """Полные названия ролей указанного типа (в порядке справочника)"""
+        return self._roles[self.resolve_type(role_type)]
+
+    def cleaned(self, role_type: str) -> List[str]:
+        """Очищенные названия ролей указанного типа (без префикса)"""
+        return self._cleaned[self.resolve_type(role_type)]
+
+    def lookup_canonical(self, role_type: str, value: str) -> Optional[str]:
+        """Роль, чье каноническое название совпадает с value (None - нет или неоднозначно)"""
+        key = ExcelService.canonical_name(value)
+        if not key:
+            return None
+        return self._canonical[self.resolve_type(role_type)].get(key)
+
+    def ngram_index(self, role_type: str, n: int = 1) -> NGramIndex:
+        """N-граммный индекс очищенных названий указанного типа (строится при первом обращении)"""
+        key = (self.resolve_type(role_type), n)
+        if key not in self._ngram_indexes:
+            self._ngram_indexes[key] = NGramIndex(self._cleaned[key[0]], n=n)
+        return self._ngram_indexes[key]
+
+    def __len__(self) -> int:
+        return sum(len(roles) for roles in self._roles.values())
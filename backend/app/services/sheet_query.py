@@ -0,0 +1,101 @@
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+
+class SheetIndex:
+    """Ленивые индексы по колонкам разобранного листа для поиска, фильтрации и сортировки.
+
+    Для каждой колонки по первому запросу строятся:
+    - строки в нижнем регистре для поиска подстроки;
+    - инвертированный индекс значение -> номера строк для фильтров;
+    - порядок сортировки (числовой, если все непустые значения - числа); сортировка
+      устойчивая в обоих направлениях, пустые значения всегда в конце.
+    Индексы живут вместе с листом в кэше (WorkbookCache.get_index).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+        self._values: Dict[str, pd.Series] = {}
+        self._lowered: Dict[str, pd.Series] = {}
+        self._postings: Dict[str, Dict[str, np.ndarray]] = {}
+        self._orders: Dict[Tuple[str, bool], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._df)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        return self._df
+
+    def values(self, column: str) -> pd.Series:
+        if column not in self._values:
+            self._values[column] = self._df[column].fillna('').astype(str).reset_index(drop=True)
+        return self._values[column]
+
+    def lowered(self, column: str) -> pd.Series:
+        if column not in self._lowered:
+            self._lowered[column] = self.values(column).str.lower()
+        return self._lowered[column]
+
+    def postings(self, column: str) -> Dict[str, np.ndarray]:
+        if column not in self._postings:
+            values = self.values(column)
+            self._postings[column] = values.groupby(values, sort=False).indices
+        return self._postings[column]
+
+    def sort_order(self, column: str, descending: bool = False) -> np.ndarray:
+        key = (column, descending)
+        if key not in self._orders:
+            values = self.values(column)
+            empty = (values == '').to_numpy()
+            numeric = pd.to_numeric(values.where(~empty), errors='coerce')
+            if numeric.notna().sum() == (~empty).sum():
+                keys = numeric
+            else:
+                keys = values.str.casefold()
+            # Ранги значений: при обратном порядке инвертируются, а не переворачивается результат,
+            # поэтому равные значения сохраняют исходный порядок строк
+            ranks, _ = pd.factorize(keys, sort=True)
+            if descending:
+                ranks = -ranks
+            # lexsort устойчив, последний ключ - главный: пустые значения в конце
+            self._orders[key] = np.lexsort((ranks, empty))
+        return self._orders[key]
+
+    def query(
+        self,
+        search: Optional[str] = None,
+        search_columns: Optional[List[str]] = None,
+        filters: Optional[Dict[str, Union[str, List[str]]]] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = False
+    ) -> np.ndarray:
+        """Номера строк (позиции), удовлетворяющих условиям, в порядке сортировки
+
+        search - подстрока без учета регистра хотя бы в одной из search_columns;
+        filters - точное совпадение значения колонки (или одного из списка значений).
+        """
+        mask = np.ones(len(self._df), dtype=bool)
+
+        for column, allowed in (filters or {}).items():
+            allowed = [allowed] if isinstance(allowed, str) else allowed
+            postings = self.postings(column)
+            column_mask = np.zeros(len(self._df), dtype=bool)
+            for value in allowed:
+                rows = postings.get(str(value))
+                if rows is not None:
+                    column_mask[rows] = True
+            mask &= column_mask
+
+        if search:
+            term = search.lower()
+            search_mask = np.zeros(len(self._df), dtype=bool)
+            for column in (search_columns or list(self._df.columns)):
+                search_mask |= self.lowered(column).str.contains(term, regex=False).to_numpy()
+            mask &= search_mask
+
+        if sort_by is None:
+            return np.flatnonzero(mask)
+
+        order = self.sort_order(sort_by, descending)
+        return order[mask[order]]
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import logging
+import threading
+import pandas as pd
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class WorkbookCache:
+    """LRU-кэш разобранных листов Excel в памяти процесса.
+
+    Ключ - хэш содержимого файла, имя листа и набор колонок (None - весь лист).
+    Объем ограничен по памяти DataFrame (memory_usage(deep=True)), при превышении
+    вытесняются давно не использованные листы. Возвращаемые DataFrame общие для всех
+    запросов - изменять их нельзя, только копии.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._frames: "OrderedDict[Hashable, pd.DataFrame]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._sheet_names: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._indexes: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[pd.DataFrame]:
+        return self.get_any([key])[1]
+
+    def get_any(self, keys: List[Hashable]) -> Tuple[Optional[Hashable], Optional[pd.DataFrame]]:
+        """Первый найденный из ключей (одно попадание или промах в статистике)"""
+        with self._lock:
+            for key in keys:
+                df = self._frames.get(key)
+                if df is not None:
+                    self._frames.move_to_end(key)
+                    self.hits += 1
+                    return key, df
+            self.misses += 1
+            return None, None
+
+    def put(self, key: Hashable, df: pd.DataFrame):
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            logger.info(f"Лист {key} ({size} байт) больше бюджета кэша, не кэшируется")
+            return
+
+        with self._lock:
+            if key in self._frames:
+                self.current_bytes -= self._sizes.pop(key)
+                del self._frames[key]
+                self._indexes.pop(key, None)
+            self._frames[key] = df
+            self._sizes[key] = size
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                old_key, _ = self._frames.popitem(last=False)
+                self.current_bytes -= self._sizes.pop(old_key)
+                self._indexes.pop(old_key, None)
+                self.evictions += 1
+
+    def get_index(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Вспомогательный индекс листа (например, SheetIndex), живущий вместе с листом
+
+        Если лист не в кэше, индекс строится заново при каждом вызове.
+        """
+        with self._lock:
+            index = self._indexes.get(key)
+            cached = key in self._frames
+        if index is not None:
+            return index
+
+        index = factory()
+        if cached:
+            with self._lock:
+                if key in self._frames:
+                    index = self._indexes.setdefault(key, index)
+        return index
+
+    def get_sheet_names(self, content_hash: str) -> Optional[List[str]]:
+        with self._lock:
+            return self._sheet_names.get(content_hash)
+
+    def put_sheet_names(self, content_hash: str, sheet_names: List[str]):
+        with self._lock:
+            self._sheet_names[content_hash] = list(sheet_names)
+            self._sheet_names.move_to_end(content_hash)
+            # Списки листов маленькие, храним их с запасом относительно числа листов в кэше
+            while len(self._sheet_names) > max(len(self._frames), 1) * 4 + 64:
+                self._sheet_names.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._sizes.clear()
+            self._indexes.clear()
+            self._sheet_names.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._frames),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+workbook_cache = WorkbookCache(max_bytes=settings.WORKBOOK_CACHE_MAX_BYTES)
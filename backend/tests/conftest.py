@@ -1,8 +1,41 @@
+import os
+import shutil
+import tempfile
 import pytest
 import pandas as pd
 from io import BytesIO
 import json
 
+# До импорта приложения: модульные кэши и хранилища создаются во временном каталоге
+# сессии, а не в каталоге данных пользователя
+STORAGE_ROOT = tempfile.mkdtemp(prefix="role_matching_tests_")
+STORAGE_DIRS = {
+    "WORKBOOK_DISK_CACHE_DIR": "sheets",
+    "ANALYSIS_STORE_DIR": "analyses",
+    "RESULT_STORE_DIR": "results",
+    "ANALYSIS_JOB_DIR": "jobs",
+}
+for _setting, _name in STORAGE_DIRS.items():
+    os.environ[_setting] = os.path.join(STORAGE_ROOT, _name)
+
+@pytest.fixture(scope="session", autouse=True)
+def storage_root():
+    yield STORAGE_ROOT
+    shutil.rmtree(STORAGE_ROOT, ignore_errors=True)
+
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path, monkeypatch):
+    """Дисковый кэш листов и хранилища анализов, результатов и задач - в каталоге теста"""
+    from app.services.disk_cache import disk_workbook_cache
+    from app.services.analysis_store import analysis_store
+    from app.services.result_store import result_store
+    from app.services.job_store import job_store
+    for store, name in ((disk_workbook_cache, "sheets"), (analysis_store, "analyses"),
+                        (result_store, "results"), (job_store, "jobs")):
+        directory = tmp_path / "storage" / name
+        directory.mkdir(parents=True)
+        monkeypatch.setattr(store, "directory", str(directory))
+
 @pytest.fixture
 def sample_excel_content():
     """Фикстура с тестовыми Excel данными"""
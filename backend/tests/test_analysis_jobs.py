@@ -0,0 +1,139 @@
+import threading
+import time
+import pytest
+from app.services.analysis_jobs import AnalysisJobManager, JobQueueFullError
+from app.services.analysis_pipeline import AnalysisPipeline, AnalysisInputError
+from app.services.job_store import JobStore
+
+class BlockingPipeline:
+    """Заглушка анализа: сообщает прогресс и ждет сигнала"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def run(self, value, progress=None):
+        progress("load", 0, 1)
+        while not self.release.wait(0.01):
+            progress("load", 0, 1)
+        if value == "bad":
+            raise AnalysisInputError("Column 'bad' not found in survey file")
+        progress("fuzzy_matches", 1, 2)
+        return {"value": value}
+
+def wait_for(manager, job_id, statuses, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} stuck in {manager.get(job_id)['status']}")
+
+class TestAnalysisJobManager:
+
+    def test_job_completes_with_progress(self):
+        """Тест: задача проходит этапы и возвращает результат"""
+        pipeline = BlockingPipeline()
+        manager = AnalysisJobManager(pipeline, max_concurrent=1, max_queued=1, ttl_seconds=60)
+        job_id = manager.submit(value="ok")["job_id"]
+
+        running = wait_for(manager, job_id, {"running"})
+        assert running["stage"] == "load"
+
+        pipeline.release.set()
+        job = wait_for(manager, job_id, {"completed"})
+        assert job["result"] == {"value": "ok"}
+        assert job["progress"]["fuzzy_matches"] == {"done": 2, "total": 2}
+
+    def test_input_error_fails_job(self):
+        """Тест: ошибка во входных данных переводит задачу в failed"""
+        pipeline = BlockingPipeline()
+        pipeline.release.set()
+        manager = AnalysisJobManager(pipeline, max_concurrent=1, max_queued=0, ttl_seconds=60)
+        job = wait_for(manager, manager.submit(value="bad")["job_id"], {"failed"})
+        assert "not found" in job["error"]
+        assert job["result"] is None
+
+    def test_cancel_running_and_queued(self):
+        """Тест отмены выполняющейся и ожидающей задачи"""
+        pipeline = BlockingPipeline()
+        manager = AnalysisJobManager(pipeline, max_concurrent=1, max_queued=1, ttl_seconds=60)
+        running_id = manager.submit(value="first")["job_id"]
+        wait_for(manager, running_id, {"running"})
+        queued_id = manager.submit(value="second")["job_id"]
+
+        assert manager.cancel(queued_id)["status"] == "cancelled"
+        manager.cancel(running_id)
+        assert wait_for(manager, running_id, {"cancelled"})["result"] is None
+        assert manager.cancel("unknown") is None
+
+    def test_queue_limit(self):
+        """Тест: сверх лимита выполняемых и ожидающих задач - JobQueueFullError"""
+        pipeline = BlockingPipeline()
+        manager = AnalysisJobManager(pipeline, max_concurrent=1, max_queued=1, ttl_seconds=60)
+        first = manager.submit(value="1")["job_id"]
+        manager.submit(value="2")
+        with pytest.raises(JobQueueFullError):
+            manager.submit(value="3")
+
+        pipeline.release.set()
+        wait_for(manager, first, {"completed"})
+
+    def test_finished_jobs_expire(self):
+        """Тест: завершенные задачи удаляются по TTL"""
+        pipeline = BlockingPipeline()
+        pipeline.release.set()
+        manager = AnalysisJobManager(pipeline, max_concurrent=1, max_queued=1, ttl_seconds=0)
+        job_id = manager.submit(value="ok")["job_id"]
+        wait_for(manager, job_id, {"completed"})
+        time.sleep(0.01)
+        manager.submit(value="next")
+        assert manager.get(job_id) is None
+
+class TestSharedJobs:
+    """Два менеджера с общим хранилищем - как процессы uvicorn с общим каталогом"""
+
+    def _managers(self, tmp_path, pipeline):
+        store = JobStore(str(tmp_path / "jobs"), ttl_seconds=60)
+        owner = AnalysisJobManager(pipeline, max_concurrent=1, max_queued=1, ttl_seconds=60, store=store)
+        other = AnalysisJobManager(pipeline, max_concurrent=1, max_queued=1, ttl_seconds=60, store=store)
+        return owner, other
+
+    def test_status_and_result_in_other_process(self, tmp_path):
+        """Тест: статус и результат задачи видны менеджеру, который ее не принимал"""
+        pipeline = BlockingPipeline()
+        owner, other = self._managers(tmp_path, pipeline)
+        job_id = owner.submit(value="ok")["job_id"]
+        assert other.get(job_id)["status"] in ("queued", "running")
+
+        pipeline.release.set()
+        wait_for(owner, job_id, {"completed"})
+        job = other.get(job_id)
+        assert job["status"] == "completed"
+        assert job["result"] == {"value": "ok"}
+        assert other.get("0" * 32) is None
+        assert other.get("../jobs") is None
+
+    def test_cancel_from_other_process(self, tmp_path):
+        """Тест: отмена через другой менеджер прерывает задачу владельца"""
+        pipeline = BlockingPipeline()
+        owner, other = self._managers(tmp_path, pipeline)
+        job_id = owner.submit(value="first")["job_id"]
+        wait_for(owner, job_id, {"running"})
+
+        assert other.cancel(job_id)["job_id"] == job_id
+        assert wait_for(owner, job_id, {"cancelled"})["result"] is None
+        assert wait_for(other, job_id, {"cancelled"})["status"] == "cancelled"
+
+class TestAnalysisPipeline:
+
+    def test_reports_all_stages(self, sample_excel_content):
+        """Тест: анализ сообщает прогресс по всем этапам"""
+        stages = []
+        result = AnalysisPipeline().run(
+            sample_excel_content['survey_content'], sample_excel_content['roles_content'],
+            control_col='Управление', operation_cols=['Ведение'], role_col='Роль', uid_col='UID',
+            replacements=[], progress=lambda stage, done, total: stages.append(stage)
+        )
+        assert list(dict.fromkeys(stages)) == list(AnalysisPipeline.STAGES)
+        assert result['auto_matches']['TU'][0]['matched'] == 'ТУ Объект 1'
@@ -0,0 +1,52 @@
+import os
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.analysis_store import AnalysisStore
+
+CONTEXT = {'survey_hash': 'abc', 'control_col': 'Управление', 'operation_cols': ['Ведение']}
+
+def make_survey():
+    return pd.DataFrame({
+        'Управление': ['Объект 1', np.nan],
+        2023: ['a', 'b'],
+        datetime(2024, 1, 31): ['c', np.nan],
+    })
+
+@pytest.fixture
+def directory(tmp_path):
+    return tmp_path / "analyses"
+
+class TestAnalysisStore:
+
+    def test_tables_roundtrip_between_instances(self, directory):
+        """Тест: таблицы анализа читаются другим процессом, имена колонок не меняются"""
+        analysis_id = AnalysisStore(str(directory), 3600).put(CONTEXT, tables={'survey': make_survey()})
+
+        store = AnalysisStore(str(directory), 3600)
+        assert store.get(analysis_id) == CONTEXT
+        survey = store.get_table(analysis_id, 'survey')
+        assert survey.columns.tolist() == ['Управление', 2023, datetime(2024, 1, 31)]
+        assert survey[2023].tolist() == ['a', 'b']
+        assert survey['Управление'].isna().iloc[1]
+        assert store.get_table(analysis_id, 'roles') is None
+
+    def test_memory_only(self):
+        """Тест: без каталога таблицы хранятся в памяти"""
+        store = AnalysisStore("", 3600)
+        analysis_id = store.put(CONTEXT, tables={'survey': make_survey()})
+        assert store.get_table(analysis_id, 'survey').equals(make_survey())
+
+    def test_expired_tables_removed(self, directory):
+        """Тест: устаревшие таблицы не читаются и удаляются при очистке"""
+        store = AnalysisStore(str(directory), 3600)
+        analysis_id = store.put(CONTEXT, tables={'survey': make_survey()})
+        old = time.time() - 7200
+        for name in os.listdir(directory):
+            os.utime(directory / name, (old, old))
+
+        assert AnalysisStore(str(directory), 3600).get_table(analysis_id, 'survey') is None
+        store.cleanup()
+        assert os.listdir(directory) == []
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.core.concurrency import BoundedExecutor, ServerBusyError, preview_executor
+
+class TestBoundedExecutor:
+
+    def test_runs_in_pool_thread(self):
+        """Тест: функция выполняется вне потока цикла событий"""
+        executor = BoundedExecutor("test", max_workers=1, max_queued=0, retry_after=3)
+        name = asyncio.run(executor.run(lambda: threading.current_thread().name))
+        assert name.startswith("test-cpu")
+        assert executor.stats()["in_flight"] == 0
+
+    def test_rejects_when_saturated(self):
+        """Тест: сверх рабочих мест и очереди - ServerBusyError с Retry-After"""
+        executor = BoundedExecutor("test", max_workers=1, max_queued=1, retry_after=3)
+        first, second = executor.reserve(), executor.reserve()
+        with pytest.raises(ServerBusyError) as error:
+            executor.reserve()
+        assert error.value.status_code == 503
+        assert error.value.headers["Retry-After"] == "3"
+
+        first.release()
+        first.release()  # повторное освобождение ничего не меняет
+        executor.reserve().release()
+        second.release()
+        assert executor.stats() == {"in_flight": 0, "max_workers": 1, "max_queued": 1, "rejected": 1}
+
+    def test_iterate_releases_reservation(self):
+        """Тест: поток занимает один допуск и освобождает его по окончании"""
+        executor = BoundedExecutor("test", max_workers=1, max_queued=0, retry_after=3)
+        reservation = executor.reserve()
+
+        async def consume():
+            return [item async for item in executor.iterate(iter([1, 2, 3]), reservation)]
+
+        assert asyncio.run(consume()) == [1, 2, 3]
+        assert executor.stats()["in_flight"] == 0
+
+    def test_iterate_closes_generator_after_running_step(self):
+        """Тест: обрыв во время next() - генератор закрывает поток пула по завершении шага"""
+        executor = BoundedExecutor("test", max_workers=2, max_queued=0, retry_after=3)
+        reservation = executor.reserve()
+        started, proceed, closed = threading.Event(), threading.Event(), threading.Event()
+
+        def records():
+            try:
+                yield 1
+                started.set()
+                proceed.wait(5)
+                yield 2
+            finally:
+                closed.set()
+
+        async def consume():
+            stream = executor.iterate(records(), reservation)
+            assert await stream.__anext__() == 1
+            step = asyncio.ensure_future(stream.__anext__())
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            step.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await step
+            # Шаг еще выполняется: генератор не закрыт, допуск занят
+            assert not closed.is_set()
+            assert executor.stats()["in_flight"] == 1
+
+        asyncio.run(consume())
+        proceed.set()
+        assert closed.wait(5)
+        deadline = time.monotonic() + 5
+        while executor.stats()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert executor.stats()["in_flight"] == 0
+
+class TestBusyResponses:
+
+    def test_preview_returns_503_when_busy(self, test_client, sample_excel_content):
+        """Тест: перегруженный пул предпросмотра отвечает 503, /health доступен"""
+        limit = preview_executor.max_workers + preview_executor.max_queued
+        reservations = [preview_executor.reserve() for _ in range(limit)]
+        try:
+            files = {'file': ('survey.xlsx', sample_excel_content['survey_content'])}
+            response = test_client.post("/api/file-preview", files=files)
+            assert response.status_code == 503
+            assert response.headers['retry-after'] == '5'
+            assert test_client.get("/health").status_code == 200
+        finally:
+            for reservation in reservations:
+                reservation.release()
+
+        files = {'file': ('survey.xlsx', sample_excel_content['survey_content'])}
+        assert test_client.post("/api/file-preview", files=files).status_code == 200
@@ -0,0 +1,76 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.disk_cache import DiskWorkbookCache
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    return DiskWorkbookCache(str(tmp_path), max_bytes=10 ** 8, ttl_seconds=3600)
+
+class TestDiskWorkbookCache:
+
+    def test_roundtrip_keeps_nan(self, disk_cache):
+        """Тест сохранения и чтения листа с пустыми ячейками"""
+        df = pd.DataFrame({'Роль': ['ТУ Объект 1', np.nan], 'UID': ['1', '2']})
+        key = ('hash', 'Лист1', None)
+        disk_cache.put(key, df)
+
+        loaded = disk_cache.get(key)
+        assert loaded['Роль'].iloc[0] == 'ТУ Объект 1'
+        assert loaded['Роль'].isna().iloc[1]
+        assert loaded.astype(str)['Роль'].iloc[1] == 'nan'
+        assert disk_cache.get(('hash', 'Лист1', ('UID',))) is None
+        assert disk_cache.stats()['hits'] == 1
+
+    def test_shared_between_instances(self, tmp_path):
+        """Тест: файл, записанный одним процессом, читается другим"""
+        key = ('hash', 'Лист "1"', ('A',))
+        DiskWorkbookCache(str(tmp_path), 10 ** 8, 3600).put(key, pd.DataFrame({'A': ['x']}))
+        DiskWorkbookCache(str(tmp_path), 10 ** 8, 3600).put_sheet_names('hash', ['Лист "1"'])
+
+        other = DiskWorkbookCache(str(tmp_path), 10 ** 8, 3600)
+        assert other.get(key)['A'].tolist() == ['x']
+        assert other.get_sheet_names('hash') == ['Лист "1"']
+
+    def test_ttl_expiry(self, disk_cache):
+        """Тест: устаревшие файлы не читаются и удаляются при очистке"""
+        key = ('hash', 'Лист1', None)
+        disk_cache.put(key, pd.DataFrame({'A': ['x']}))
+        path = disk_cache._path(key)
+        old = time.time() - 7200
+        os.utime(path, (old, old))
+
+        assert disk_cache.get(key) is None
+        disk_cache.cleanup(force=True)
+        assert not os.path.exists(path)
+
+    def test_size_eviction(self, tmp_path):
+        """Тест: при превышении объема удаляются давно не использованные файлы"""
+        cache = DiskWorkbookCache(str(tmp_path), max_bytes=10 ** 8, ttl_seconds=3600)
+        first, second = ('a', 'Лист1', None), ('b', 'Лист1', None)
+        cache.put(first, pd.DataFrame({'A': ['x' * 1000] * 100}))
+        cache.put(second, pd.DataFrame({'A': ['y' * 1000] * 100}))
+        old = time.time() - 60
+        os.utime(cache._path(first), (old, old))
+
+        cache.max_bytes = os.path.getsize(cache._path(second))
+        cache.cleanup(force=True)
+        assert cache.get(first) is None
+        assert cache.get(second) is not None
+
+    def test_disabled_without_directory(self):
+        """Тест: пустой каталог отключает кэш"""
+        cache = DiskWorkbookCache("", 10 ** 8, 3600)
+        cache.put(('a', 'Лист1', None), pd.DataFrame({'A': ['x']}))
+        assert cache.get(('a', 'Лист1', None)) is None
+
+    @pytest.mark.skipif(not hasattr(os, "getuid") or os.getuid() != 0, reason="нужен root для смены владельца")
+    def test_rejects_foreign_directory(self, tmp_path):
+        """Тест: каталог другого пользователя не принимается"""
+        directory = tmp_path / 'foreign'
+        directory.mkdir()
+        os.chown(directory, 12345, 12345)
+        with pytest.raises(PermissionError):
+            DiskWorkbookCache(str(directory), 10 ** 8, 3600)
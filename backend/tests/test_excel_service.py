@@ -1,6 +1,7 @@
 import pytest
 import pandas as pd
 import numpy as np
+from io import BytesIO
 from app.services.excel_service import ExcelService
 
 class TestExcelService:
@@ -43,6 +44,12 @@ class TestExcelService:
         assert excel_service.clean_name("'Объект'") == "Объект"
         assert excel_service.clean_name("«Объект»") == "Объект"
     
+    def test_canonical_name(self, excel_service):
+        """Тест канонического ключа: очистка, регистр и пробелы"""
+        assert excel_service.canonical_name('ПС  "Северная"  110 кВ') == "северная 110"
+        assert excel_service.canonical_name("п/с СЕВЕРНАЯ 110") == "северная 110"
+        assert excel_service.canonical_name("ПС") == ""
+    
     def test_is_iv_role_detection(self, excel_service):
         """Тест определения ИВ ролей"""
         assert excel_service.is_iv_role("Роль (И)") == True
@@ -94,6 +101,42 @@ class TestExcelService:
         result = excel_service.apply_replacements("тест", [{"old": "", "new": "новое"}])
         assert result == "тест"
     
+    def test_collect_unique_values(self, excel_service, sample_excel_content):
+        """Тест векторного сбора уникальных значений против построчного обхода"""
+        survey_df = sample_excel_content['survey_df'].copy()
+        survey_df.loc[len(survey_df)] = [None, ' Роль 1 ,, Роль 6 (и)', np.nan]
+        operation_cols = ['Ведение', 'Дополнительно']
+
+        expected_control, expected_operation, expected_iv = set(), set(), set()
+        for _, row in survey_df.iterrows():
+            if pd.notna(row['Управление']) and str(row['Управление']).strip():
+                expected_control.add(str(row['Управление']).strip())
+            for col in operation_cols:
+                for val in excel_service.split_values(row[col]):
+                    if excel_service.is_iv_role(val):
+                        expected_iv.add(excel_service.extract_iv_base(val))
+                    else:
+                        expected_operation.add(val)
+
+        unique_control, unique_operation, unique_iv = excel_service.collect_unique_values(
+            survey_df, 'Управление', operation_cols
+        )
+        assert unique_control == ['Объект 1', 'Объект 2', 'Объект 3']
+        assert set(unique_operation) == expected_operation
+        assert len(unique_operation) == len(expected_operation)
+        assert set(unique_iv) == expected_iv == {'Роль 3', 'Роль 5', 'Роль 6'}
+
+    def test_build_roles_dict(self, excel_service):
+        """Тест построения словаря ролей"""
+        roles_df = pd.DataFrame({
+            'Роль': [' ТУ Объект 1 ', None, 'ТВ Роль 1', 'ТУ Объект 1'],
+            'UID': ['UID001', 'UID002', 3, 'UID004']
+        })
+        roles_dict, role_names = excel_service.build_roles_dict(roles_df, 'Роль', 'UID')
+
+        assert roles_dict == {'ТУ Объект 1': 'UID004', 'ТВ Роль 1': '3'}
+        assert role_names == ['ТУ Объект 1', 'ТВ Роль 1', 'ТУ Объект 1']
+
     def test_load_excel_sheets_success(self, excel_service, sample_excel_content):
         """Тест успешной загрузки Excel файла"""
         sheets = excel_service.load_excel_sheets(sample_excel_content['survey_content'])
@@ -102,6 +145,94 @@ class TestExcelService:
         assert len(sheets) == 1
         assert isinstance(sheets['Survey'], pd.DataFrame)
     
+    def test_load_excel_sheet_projected(self, excel_service, sample_excel_content):
+        """Тест загрузки только нужных колонок первого листа строками"""
+        df = excel_service.load_excel_sheet(
+            sample_excel_content['roles_content'], columns=['UID', 'Роль', 'Нет такой']
+        )
+        assert list(df.columns) == ['Роль', 'UID']
+        assert df['UID'].tolist() == ['UID001', 'UID002', 'UID003', 'UID004', 'UID005']
+
+        numbers = BytesIO()
+        pd.DataFrame({'A': [1, None], 'B': ['x', 'y']}).to_excel(numbers, index=False)
+        df = excel_service.load_excel_sheet(numbers.getvalue(), columns=['A'])
+        assert df['A'].iloc[0] == '1'
+        assert pd.isna(df['A'].iloc[1])
+
+    def test_sniff_workbook(self, excel_service):
+        """Тест потокового чтения заголовков и первых строк"""
+        content = BytesIO()
+        with pd.ExcelWriter(content, engine='openpyxl') as writer:
+            pd.DataFrame({'A': range(500), 'B': ['x'] * 500}).to_excel(writer, sheet_name='Большой', index=False)
+            pd.DataFrame({'C': [1, 2]}).to_excel(writer, sheet_name='Малый', index=False)
+
+        sheets = excel_service.sniff_workbook(content.getvalue(), 10)
+
+        assert list(sheets) == ['Большой', 'Малый']
+        assert sheets['Большой']['columns'] == ['A', 'B']
+        assert len(sheets['Большой']['sample']) == 10
+        assert sheets['Большой']['total_rows'] == 500
+        assert sheets['Большой']['total_rows_exact'] is False
+        assert sheets['Малый']['total_rows'] == 2
+        assert sheets['Малый']['total_rows_exact'] is True
+        assert sheets['Малый']['sample']['C'].tolist() == ['1', '2']
+
+    def test_read_sheet_columns_matches_pandas(self, excel_service):
+        """Тест: потоковое чтение колонок совпадает с pd.read_excel(usecols, dtype=str)"""
+        import datetime
+        from openpyxl import Workbook
+        book = Workbook()
+        sheet = book.active
+        sheet.append(['A', 'B', None, 'A', 'C'])
+        sheet.append([1, 1.5, 'x', 'дубль', True])
+        sheet.append([None, None, None, None, None])
+        sheet.append([None, None, 'только третья', None, None])
+        sheet.append(['NA', 'null', None, ' пробел ', datetime.datetime(2024, 1, 2)])
+        sheet.append([2.0, 1e20, None, '#N/A', False, 'лишняя'])
+        sheet.append([None, None, None, None, None])
+        content = BytesIO()
+        book.save(content)
+
+        for columns in (['A', 'C'], ['A.1', 'B'], ['B', 'Нет такой']):
+            wanted = set(columns)
+            expected = pd.read_excel(BytesIO(content.getvalue()), usecols=lambda c: c in wanted, dtype=str)
+            streamed = excel_service._read_sheet_columns(content.getvalue(), 'Sheet', columns)
+            pd.testing.assert_frame_equal(streamed, expected)
+
+        # Безымянные колонки читаются через pandas
+        assert excel_service._read_sheet_columns(content.getvalue(), 'Sheet', ['Unnamed: 2']) is None
+
+    def test_load_from_file_and_streaming_path(self, excel_service, sample_excel_content, monkeypatch):
+        """Тест: файловый объект и потоковый путь дают тот же лист, что и байты"""
+        from tempfile import SpooledTemporaryFile
+        from app.core.config import settings
+        from app.services.workbook_cache import workbook_cache
+        from app.services.disk_cache import disk_workbook_cache
+
+        content = sample_excel_content['roles_content']
+        expected = pd.read_excel(BytesIO(content), dtype=str)
+        handle = SpooledTemporaryFile()
+        handle.write(content)
+
+        assert excel_service.content_hash(handle) == excel_service.content_hash(content)
+        archive = excel_service.inspect_archive(handle)
+        assert archive['uncompressed'] > archive['compressed'] > 0
+        assert 0 < archive['worksheets'] < archive['uncompressed']
+        assert excel_service.inspect_archive(b'not a zip') is None
+
+        monkeypatch.setattr(settings, 'EXCEL_STREAMING_THRESHOLD_BYTES', 0)
+        monkeypatch.setattr(disk_workbook_cache, 'enabled', False)
+        workbook_cache.clear()
+        calls = []
+        original = ExcelService._read_sheet_columns
+        monkeypatch.setattr(ExcelService, '_read_sheet_columns',
+                            staticmethod(lambda *args: calls.append(args) or original(*args)))
+
+        df = excel_service.load_excel_sheet(handle, columns=['Роль', 'UID'])
+        assert len(calls) == 1
+        pd.testing.assert_frame_equal(df, expected)
+        workbook_cache.clear()
+
     def test_load_excel_sheets_invalid_data(self, excel_service):
         """Тест загрузки невалидного Excel"""
         with pytest.raises(Exception):
@@ -0,0 +1,33 @@
+import io
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from app.services.export_service import ExportService
+
+def make_result():
+    return pd.DataFrame({
+        "Управление": ["Объект 1", "Объект с длинным названием", np.nan],
+        "ТУ_роли": ["ТУ Объект 1", "", "ТУ " + "x" * 80],
+        "Номер": [1, 2, 3],
+    })
+
+class TestExportService:
+
+    def test_column_widths(self):
+        """Тест ширины колонок: самое длинное значение или заголовок, не больше 50"""
+        assert ExportService.column_widths(make_result()) == [28, 50, 7]
+
+    def test_write_result_excel(self):
+        """Тест записи результата: значения, пустые ячейки, подсветка и ширина"""
+        output = io.BytesIO()
+        ExportService.write_result_excel(make_result(), [1], output)
+        output.seek(0)
+        ws = load_workbook(output)["Результат"]
+
+        rows = list(ws.iter_rows(values_only=True))
+        assert rows[0] == ("Управление", "ТУ_роли", "Номер")
+        assert rows[1] == ("Объект 1", "ТУ Объект 1", 1)
+        assert rows[3][0] is None
+        assert ws.cell(row=3, column=2).fill.start_color.rgb.endswith("FFFF00")
+        assert ws.cell(row=2, column=1).fill.fill_type is None
+        assert ws.column_dimensions["A"].width == 28
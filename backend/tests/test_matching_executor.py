@@ -0,0 +1,80 @@
+import os
+import pytest
+from app.services.matching_executor import MatchingExecutor
+from app.services.role_index import RoleIndex
+
+@pytest.fixture
+def role_index():
+    roles = [f"{prefix} Объект {name} {i}" for prefix in ("ТУ", "ТВ", "ИВ")
+             for name in ("Северная", "Южная", "Речная") for i in range(1, 8)]
+    return RoleIndex(roles)
+
+@pytest.fixture
+def values_by_type():
+    values = [f"{name} {i}" for name in ("Северная", "Южноя", "Речная", "Лесная") for i in range(1, 10)]
+    return {"TU": values, "TV": values[::-1], "IV": values[:5]}
+
+class TestMatchingExecutor:
+
+    def test_pool_equals_in_process(self, role_index, values_by_type):
+        """Тест: результат пула совпадает с поиском в текущем процессе (включая порядок)"""
+        in_process = MatchingExecutor(pool_size=1).match(values_by_type, role_index)
+        executor = MatchingExecutor(pool_size=2, chunk_size=4, min_values=0)
+        try:
+            pooled = executor.match(values_by_type, role_index)
+        finally:
+            executor.shutdown()
+
+        assert pooled == in_process
+        assert len(pooled["TU"]) > 0
+
+    def test_pool_reused_between_calls(self, role_index, values_by_type):
+        """Тест: пул создается один раз на исполнитель и останавливается shutdown"""
+        executor = MatchingExecutor(pool_size=2, chunk_size=4, min_values=0)
+        try:
+            first = executor.match(values_by_type, role_index)
+            pool = executor._pool
+            second = executor.match(values_by_type, role_index)
+
+            assert pool is not None
+            assert executor._pool is pool
+            assert second == first
+            # Файл индекса ролей нужен только на время поиска
+            index_dir = executor._index_dir
+            assert os.listdir(index_dir) == []
+        finally:
+            executor.shutdown()
+        assert executor._pool is None
+        assert not os.path.exists(index_dir)
+
+    def test_small_input_stays_in_process(self, role_index, values_by_type):
+        """Тест: небольшой объем не поднимает пул процессов"""
+        executor = MatchingExecutor(pool_size=4, chunk_size=4, min_values=10_000)
+        assert executor.match(values_by_type, role_index) == \
+            MatchingExecutor(pool_size=1).match(values_by_type, role_index)
+
+    def test_workers_bounded_by_chunks(self):
+        """Тест: процессов не больше, чем порций"""
+        executor = MatchingExecutor(pool_size=32, chunk_size=100)
+        assert executor._workers_for(250) == 3
+        assert executor._workers_for(10_000) == 32
+
+    def test_progress_and_interrupt(self, role_index, values_by_type):
+        """Тест: прогресс по порциям и прерывание поиска исключением из progress"""
+        calls = []
+        executor = MatchingExecutor(pool_size=1, chunk_size=4)
+        result = executor.match(values_by_type, role_index, progress=lambda done, total: calls.append((done, total)))
+
+        assert result == MatchingExecutor(pool_size=1).match(values_by_type, role_index)
+        assert calls[-1] == (77, 77)
+        assert [done for done, _ in calls] == sorted(done for done, _ in calls)
+
+        def interrupt(done, total):
+            raise KeyboardInterrupt()
+
+        pooled = MatchingExecutor(pool_size=2, chunk_size=4, min_values=0)
+        try:
+            with pytest.raises(KeyboardInterrupt):
+                pooled.match(values_by_type, role_index, progress=interrupt)
+        finally:
+            pooled.shutdown()
@@ -59,4 +59,98 @@ class TestMatchingService:
         assert len(matches) == 3
         # Результаты должны быть отсортированы по убыванию score
         scores = [match[1] for match in matches]
-        assert scores == sorted(scores, reverse=True)
\ No newline at end of file
+        assert scores == sorted(scores, reverse=True)
+
+    def test_find_similar_matches_batch_equals_single(self, matching_service):
+        """Тест совпадения пакетного поиска с поэлементным"""
+        roles_list = [
+            "ТУ Объект Тестовый",
+            "ТУ ПС Тестовый",
+            "ТУ Тестовый Объект",
+            "ТУ Совсем Другой",
+            "ТВ Тестовый"
+        ]
+        values = ["Тестовый", "Объект", "ПС", "Другой объект", "   "]
+
+        batch = matching_service.find_similar_matches_batch(values, "TU", roles_list, threshold=60)
+        expected = []
+        for val in values:
+            matches = matching_service.find_similar_matches(val, "TU", roles_list, threshold=60)
+            if matches:
+                expected.append({
+                    "original": val,
+                    "candidates": [{"role_name": m[0], "score": m[1]} for m in matches]
+                })
+
+        assert batch == expected
+
+    def test_find_similar_matches_batch_top_k(self, matching_service):
+        """Тест ограничения числа кандидатов"""
+        roles_list = ["ТУ Объект Тестовый", "ТУ ПС Тестовый", "ТУ Тестовый Объект"]
+        batch = matching_service.find_similar_matches_batch(["Тестовый"], "TU", roles_list, threshold=60, top_k=1)
+
+        assert len(batch) == 1
+        assert batch[0]["candidates"] == [{"role_name": "ТУ ПС Тестовый", "score": 100}]
+
+    def test_match_unique_values_structure(self, matching_service):
+        """Тест структуры pending_matches для всех типов"""
+        from app.services.role_index import RoleIndex
+        index = RoleIndex(["ТУ Объект 1", "ТВ Роль 1", "ИВ Роль 3"])
+        pending = matching_service.match_unique_values(
+            {"TU": ["Объект 2"], "TV": ["Роль 2"], "IV": []}, index
+        )
+
+        assert set(pending.keys()) == {"TU", "TV", "IV"}
+        assert pending["TU"][0]["candidates"][0]["role_name"] == "ТУ Объект 1"
+        assert pending["TV"][0]["original"] == "Роль 2"
+        assert pending["IV"] == []
+
+    def test_cluster_values_same_cleaned_name(self, matching_service):
+        """Тест группировки вариантов с одинаковым clean_name"""
+        clusters = matching_service.cluster_values(["ПС Северная", "П/С Северная", "«Северная»", "Южная"], threshold=100)
+        assert sorted(map(sorted, clusters)) == [["«Северная»", "П/С Северная", "ПС Северная"], ["Южная"]]
+
+    def test_cluster_values_near_duplicates(self, matching_service):
+        """Тест объединения опечаток и разделения объектов с разными номерами"""
+        clusters = matching_service.cluster_values(["Северная 2", "северноя 2", "Северная 3"], threshold=85)
+        assert sorted(map(sorted, clusters)) == [["Северная 2", "северноя 2"], ["Северная 3"]]
+
+    def test_match_unique_values_fan_out(self, matching_service):
+        """Тест раздачи кандидатов представителя всем членам группы"""
+        from app.services.role_index import RoleIndex
+        index = RoleIndex(["ТУ Северная 1", "ТУ Южная"])
+        pending = matching_service.match_unique_values(
+            {"TU": ["ПС Северная", "П/С Северная"], "TV": [], "IV": []}, index, cluster_threshold=100
+        )
+
+        assert sorted(item["original"] for item in pending["TU"]) == ["П/С Северная", "ПС Северная"]
+        assert pending["TU"][0]["candidates"] == pending["TU"][1]["candidates"]
+
+    def test_match_unique_values_default_equals_per_value(self, matching_service):
+        """Тест: по умолчанию похожие, но разные значения ищутся каждое отдельно"""
+        from app.services.role_index import RoleIndex
+        index = RoleIndex(["ТВ Новосибирской ТЭС", "ТВ Новосибирской ТЭЦ"])
+        values = ["Новосибирская ТЭС", "Новосибирская ТЭЦ"]
+        pending = matching_service.match_unique_values({"TU": [], "TV": values, "IV": []}, index)
+
+        expected = matching_service.find_similar_matches_batch(values, "TV", index)
+        assert sorted(pending["TV"], key=lambda item: item["original"]) == \
+            sorted(expected, key=lambda item: item["original"])
+        tec = next(item for item in pending["TV"] if item["original"] == "Новосибирская ТЭЦ")
+        assert tec["candidates"][0]["role_name"] == "ТВ Новосибирской ТЭЦ"
+
+class TestIterMatchUniqueValues:
+
+    def test_chunks_concatenate_to_full_result(self, matching_service):
+        """Тест: части потокового поиска в сумме дают результат match_unique_values"""
+        from app.services.role_index import RoleIndex
+        from app.services.matching_executor import MatchingExecutor
+        role_index = RoleIndex([f"ТУ Объект {name} {i}" for name in ("Северная", "Южная") for i in range(10)])
+        values = {"TU": [f"Обьект {name} {i}" for name in ("Северная", "Южная", "северная") for i in range(10)],
+                  "TV": [], "IV": []}
+        executor = MatchingExecutor(pool_size=1, chunk_size=7)
+
+        chunks = list(matching_service.iter_match_unique_values(values, role_index, executor=executor))
+        assert len(chunks) > 1
+        merged = [item for _, items in chunks for item in items]
+        assert merged == matching_service.match_unique_values(values, role_index)["TU"]
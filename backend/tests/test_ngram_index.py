@@ -0,0 +1,61 @@
+import random
+import pytest
+from fuzzywuzzy import fuzz
+from app.services.ngram_index import NGramIndex
+
+def random_names(rng, count, alphabet="абвгдеёжПСТУ 12-", max_len=20):
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len))) for _ in range(count)]
+
+class TestNGramIndex:
+
+    @pytest.mark.parametrize("n", [1, 2, 3])
+    @pytest.mark.parametrize("threshold", [1, 40, 60, 61, 85, 100])
+    def test_candidates_superset_of_brute_force(self, n, threshold):
+        """Тест: отсев никогда не теряет роли, набирающие порог"""
+        rng = random.Random(n * 1000 + threshold)
+        roles = random_names(rng, 300)
+        values = random_names(rng, 60)
+        index = NGramIndex(roles, n=n)
+
+        for value in values:
+            expected = {i for i, role in enumerate(roles) if fuzz.ratio(value, role) >= threshold}
+            candidates = set(index.candidates(value, threshold).tolist())
+            assert expected <= candidates, f"Потеряны кандидаты для '{value}'"
+
+    def test_candidates_prune(self):
+        """Тест: роли без общих символов и с далекой длиной отсеиваются"""
+        index = NGramIndex(["Северная", "Южная", "Ж", "Очень длинное название подстанции"])
+        assert index.candidates("Северная", 60).tolist() == [0]
+
+    def test_empty_strings(self):
+        """Тест: пустое значение совпадает только с пустой ролью"""
+        index = NGramIndex(["", "Объект"])
+        assert index.candidates("", 60).tolist() == [0]
+
+    def test_batch_with_index_equals_brute_force(self, matching_service):
+        """Тест: пакетный поиск с индексом совпадает с полным перебором"""
+        rng = random.Random(42)
+        words = ["Северная", "Южная", "Западная", "Тестовая", "Новая", "Речная"]
+        noise = ["ПС", "П/С", "подстанция", "110 кВ", "ВЛ", "", '"']
+        roles = [
+            f"{rng.choice(['ТУ', 'ТВ', 'ИВ'])} {rng.choice(noise)} {rng.choice(words)} {rng.randint(1, 9)}"
+            for _ in range(400)
+        ]
+        values = [f"{rng.choice(noise)} {rng.choice(words)[:rng.randint(3, 8)]} {rng.randint(1, 9)}"
+                  for _ in range(80)]
+
+        for role_type in ("TU", "TV", "IV"):
+            for threshold in (60, 80):
+                pruned = matching_service.find_similar_matches_batch(
+                    values, role_type, roles, threshold=threshold, use_ngram_index=True)
+                brute = matching_service.find_similar_matches_batch(
+                    values, role_type, roles, threshold=threshold, use_ngram_index=False)
+                assert pruned == brute
+
+        single = []
+        for val in values:
+            matches = matching_service.find_similar_matches(val, "TU", roles)
+            if matches:
+                single.append({"original": val,
+                               "candidates": [{"role_name": m[0], "score": m[1]} for m in matches]})
+        assert matching_service.find_similar_matches_batch(values, "TU", roles, use_ngram_index=True) == single
@@ -0,0 +1,51 @@
+import re
+import pytest
+from app.services.normalization import NormalizationPipeline
+
+def legacy_clean_name(name):
+    """Исходная реализация ExcelService.clean_name (четыре прохода)"""
+    name = str(name).strip()
+    name = re.sub(r'[\"\'«»]', '', name)
+    for pattern in [
+        r'\b(ПС|подстанция|п/с|п\.с\.|П/С)\b',
+        r'\b(линия|кабель|ВЛ|КЛ)\b',
+        r'\b(кВ|кв|KV|kV)\b',
+        r'\b(напряжение|электропередачи|ЭП)\b'
+    ]:
+        name = re.sub(pattern, '', name, flags=re.IGNORECASE)
+    return re.sub(r'\s+', ' ', name).strip()
+
+class TestNormalizationPipeline:
+
+    @pytest.mark.parametrize("name", [
+        "ПС Тестовая", '"Кабель" 110 кВ', "подстанция Объект", "ВЛ Линия 220",
+        "-п.с.КЛ", "п.с.п.с. x", "П/С «Северная» 35кВ", "ЭП-ВЛ-кв", "Кабельная линия", "", 123
+    ])
+    def test_matches_legacy_clean_name(self, name):
+        """Тест: объединенное выражение дает тот же результат, что четыре прохода"""
+        assert NormalizationPipeline().clean_name(name) == legacy_clean_name(name)
+
+    def test_cache_counters(self):
+        """Тест счетчиков попаданий и промахов кэша"""
+        pipeline = NormalizationPipeline(cache_size=2)
+        pipeline.clean_name("ПС Северная")
+        pipeline.clean_name("ПС Северная")
+        pipeline.clean_name("ПС Южная")
+        pipeline.clean_name("ПС Западная")
+
+        info = pipeline.cache_info()
+        assert info["hits"] == 1
+        assert info["misses"] == 3
+        assert info["size"] == 2
+
+    def test_extra_noise_words(self):
+        """Тест расширения списка общих слов"""
+        pipeline = NormalizationPipeline(extra_noise_words=["ТП", "РП(10)"])
+        assert pipeline.clean_name("ТП Северная РП(10)") == "Северная"
+        assert pipeline.clean_name("ТПС Северная") == "ТПС Северная"
+
+    def test_extract_iv_base(self):
+        """Тест удаления признака ИВ"""
+        pipeline = NormalizationPipeline()
+        assert pipeline.extract_iv_base("Роль (ИВ)") == "Роль"
+        assert pipeline.extract_iv_base("Роль (и)") == "Роль"
@@ -0,0 +1,93 @@
+import pandas as pd
+from app.services.processing_service import ProcessingService
+
+ROLES = {
+    'ТУ Объект 1': 'UID001', 'ТВ Роль 1': 'UID002', 'ТВ Роль 3': 'UID003',
+    'ИВ Роль 3': 'UID004', 'ТУ Другой': 'UID005'
+}
+
+def make_survey():
+    return pd.DataFrame({
+        'Управление': ['Объект 1', 'Объект 2', ''],
+        'Ведение': ['Роль 1, Роль 2', 'Роль 3 (И)', ''],
+        'Ведение 2': ['Роль 1', '', 'Роль 3 (ИВ)'],
+        'Комментарий': ['к1', None, 'к3'],
+    })
+
+def make_analysis_data():
+    return {
+        'unique_tu': ['Объект 1', 'Объект 2'],
+        'unique_tv': ['Роль 1', 'Роль 2'],
+        'unique_iv': ['Роль 3'],
+        'auto_matches': {
+            'TU': [{'original': 'Объект 1', 'matched': 'ТУ Объект 1', 'uid': 'UID001', 'type': 'exact'}],
+            'TV': [{'original': 'Роль 1', 'matched': 'ТВ Роль 1', 'uid': 'UID002', 'type': 'normalized'}],
+            'IV': [{'original': 'Роль 3', 'matched': 'ИВ Роль 3', 'uid': 'UID004', 'type': 'normalized'}],
+        },
+    }
+
+class TestProcessingService:
+
+    def test_build_resolution(self):
+        """Тест таблицы сопоставлений: выбор пользователя важнее авто, UID из справочника"""
+        resolution = ProcessingService.build_resolution(
+            make_analysis_data()['auto_matches'],
+            {'TU': {'Объект 1': 'ТУ Другой', 'Объект 2': '', 'Объект 3': 'Нет в справочнике'}},
+            ROLES
+        ).set_index(['type', 'value'])
+        assert resolution.loc[('TU', 'Объект 1'), 'role_name'] == 'ТУ Другой'
+        assert resolution.loc[('TU', 'Объект 1'), 'uid'] == 'UID005'
+        assert resolution.loc[('TU', 'Объект 1'), 'match_type'] == 'manual'
+        assert ('TU', 'Объект 2') not in resolution.index
+        assert ('TU', 'Объект 3') not in resolution.index
+        assert len(resolution) == 3
+
+    def test_explode_values(self):
+        """Тест разворота значений по строкам: порядок ТУ, затем колонки ведения"""
+        values = ProcessingService.explode_values(make_survey(), 'Управление', ['Ведение', 'Ведение 2'])
+        assert list(values.itertuples(index=False, name=None)) == [
+            (0, 'TU', 'Объект 1'), (0, 'TV', 'Роль 1'), (0, 'TV', 'Роль 2'), (0, 'TV', 'Роль 1'),
+            (1, 'TU', 'Объект 2'), (1, 'IV', 'Роль 3'),
+            (2, 'IV', 'Роль 3'),
+        ]
+
+    def test_process(self):
+        """Тест итоговой таблицы, подсветки и сводок"""
+        result = ProcessingService().process(
+            make_survey(), 'Управление', ['Ведение', 'Ведение 2'], ROLES,
+            make_analysis_data(), {'TV': {'Роль 2': 'ТВ Роль 3'}}
+        )
+        data = result['data']
+        assert list(data.columns) == [
+            'Управление', 'Ведение', 'Ведение 2', 'Комментарий', 'ТУ_роли', 'ТВ_роли', 'ИВ_роли', 'Сводка_роли'
+        ]
+        assert data['Комментарий'].tolist() == ['к1', None, 'к3']
+        assert data.loc[0, 'ТУ_роли'] == 'ТУ Объект 1'
+        assert data.loc[0, 'ТВ_роли'] == 'ТВ Роль 1, ТВ Роль 3'
+        assert data.loc[0, 'Сводка_роли'] == 'UID001!UID002!UID003'
+        assert data.loc[1, 'ТУ_роли'] == ''
+        assert data.loc[1, 'ИВ_роли'] == 'ИВ Роль 3'
+        assert data.loc[2, 'Сводка_роли'] == 'UID004'
+        # Во второй строке не найдено "Объект 2"
+        assert result['highlight_rows'] == [1]
+
+        assert result['tu_summary']['Объект 2'] == {
+            'role_name': '', 'found': False, 'uid': '', 'match_type': ''
+        }
+        assert result['tv_summary']['Роль 2'] == {
+            'role_name': 'ТВ Роль 3', 'found': True, 'uid': 'UID003', 'match_type': 'manual'
+        }
+        assert result['iv_summary']['Роль 3']['uid'] == 'UID004'
+
+    def test_process_large_survey(self):
+        """Тест обработки большого опроса без обхода строк"""
+        survey = pd.concat([make_survey()] * 20000, ignore_index=True)
+        result = ProcessingService().process(
+            survey, 'Управление', ['Ведение', 'Ведение 2'], ROLES,
+            make_analysis_data(), {'TU': {'Объект 2': 'ТУ Другой'}}
+        )
+        assert len(result['data']) == 60000
+        assert result['data']['ТУ_роли'].iloc[4] == 'ТУ Другой'
+        # Остается строка 0 каждой тройки - "Роль 2" не сопоставлена
+        assert result['highlight_rows'][:3] == [0, 3, 6]
+        assert len(result['highlight_rows']) == 20000
@@ -0,0 +1,58 @@
+import random
+import pandas as pd
+import pytest
+from app.services.excel_service import ExcelService
+from app.services.replacement_engine import ReplacementEngine
+
+class TestReplacementEngine:
+
+    def test_independent_rules_single_stage(self):
+        """Тест: независимые правила выполняются за один проход"""
+        engine = ReplacementEngine([
+            {"old": "старое", "new": "новое"},
+            {"old": "ПС", "new": "Подстанция"},
+            {"old": " ", "new": ""}
+        ])
+        assert engine.stage_count == 1
+        assert engine.apply("старое значение") == "новое значение"
+        assert engine.apply("ПС Тест") == "Подстанция Тест"
+
+    def test_dependent_rules_keep_order(self):
+        """Тест: правило, зависящее от результата предыдущего, применяется после него"""
+        replacements = [{"old": "a", "new": "b"}, {"old": "b", "new": "c"}, {"old": "bc", "new": "X"}]
+        engine = ReplacementEngine(replacements)
+        assert engine.stage_count == 3
+        assert engine.apply("abc") == ExcelService.apply_replacements("abc", replacements)
+
+    def test_empty_values_unchanged(self):
+        """Тест: пустые значения и пустые правила"""
+        engine = ReplacementEngine([{"old": "  ", "new": "x"}, {"old": "a", "new": "b"}])
+        assert engine.apply("") == ""
+        assert engine.apply(None) is None
+        assert engine.apply("   ") == "   "
+        assert engine.apply("aa") == "bb"
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_matches_sequential_semantics(self, seed):
+        """Тест: результат совпадает с ExcelService.apply_replacements на случайных правилах"""
+        rng = random.Random(seed)
+        alphabet = "abcП "
+
+        def word(max_len):
+            return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+
+        for _ in range(50):
+            replacements = [{"old": word(3), "new": word(3)} for _ in range(rng.randint(1, 8))]
+            engine = ReplacementEngine(replacements)
+            for _ in range(20):
+                text = word(12)
+                assert engine.apply(text) == ExcelService.apply_replacements(text, replacements), \
+                    (text, replacements)
+
+    def test_apply_series(self):
+        """Тест: замены в колонке совпадают с поэлементным применением"""
+        replacements = [{"old": "ПС", "new": "Подстанция"}]
+        series = pd.Series(["ПС 1", "ПС 1", "", "Другое", "ПС 2"])
+        result = ReplacementEngine(replacements).apply_series(series)
+
+        assert result.tolist() == [ExcelService.apply_replacements(v, replacements) for v in series]
@@ -0,0 +1,74 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.result_store import ResultStore
+
+META = {'highlight_rows': [1], 'tu_summary': {'Объект 1': {'uid': 'UID001'}}, 'tv_summary': {}, 'iv_summary': {}}
+
+@pytest.fixture
+def result_store(tmp_path):
+    return ResultStore(str(tmp_path), max_bytes=10 ** 8, ttl_seconds=3600)
+
+class TestResultStore:
+
+    def test_roundtrip_between_instances(self, tmp_path):
+        """Тест: результат, записанный одним процессом, читается другим"""
+        df = pd.DataFrame({'Управление': ['Объект 1', np.nan], 'ТУ_роли': ['ТУ Объект 1', '']})
+        ResultStore(str(tmp_path), 10 ** 8, 3600).put('proc_1', df, META)
+
+        stored = ResultStore(str(tmp_path), 10 ** 8, 3600).get('proc_1')
+        assert stored['highlight_rows'] == [1]
+        assert stored['tu_summary'] == META['tu_summary']
+        assert stored['data']['ТУ_роли'].tolist() == ['ТУ Объект 1', '']
+        assert stored['data']['Управление'].isna().iloc[1]
+
+    def test_unknown_and_invalid_id(self, result_store):
+        """Тест: неизвестный и недопустимый process_id"""
+        assert result_store.get('proc_2') is None
+        assert result_store.get('../proc_1') is None
+        with pytest.raises(ValueError):
+            result_store.put('../proc_1', pd.DataFrame({'A': ['x']}), META)
+
+    def test_ttl_expiry(self, result_store):
+        """Тест: устаревший результат не читается и удаляется при очистке"""
+        result_store.put('proc_1', pd.DataFrame({'A': ['x']}), META)
+        path = result_store.path('proc_1')
+        old = time.time() - 7200
+        os.utime(path, (old, old))
+
+        assert result_store.get('proc_1') is None
+        result_store.cleanup(force=True)
+        assert not os.path.exists(path)
+
+    def test_size_eviction(self, result_store):
+        """Тест: при превышении объема удаляются давно не использованные результаты"""
+        result_store.put('proc_1', pd.DataFrame({'A': ['x' * 1000] * 100}), META)
+        result_store.put('proc_2', pd.DataFrame({'A': ['y' * 1000] * 100}), META)
+        old = time.time() - 60
+        os.utime(result_store.path('proc_1'), (old, old))
+
+        result_store.max_bytes = 150_000
+        result_store.cleanup(force=True)
+        assert result_store.get('proc_1') is None
+        assert result_store.get('proc_2') is not None
+
+    def test_ignores_foreign_files(self, result_store):
+        """Тест: чужие файлы в каталоге результата (pickle вместо таблицы) не читаются"""
+        path = os.path.join(result_store.directory, 'proc_evil')
+        os.makedirs(path)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            f.write('{"highlight_rows": []}')
+        with open(os.path.join(path, 'data.pkl'), 'wb') as f:
+            f.write(b'not a table')
+        assert result_store.get('proc_evil') is None
+
+    def test_private_directory(self, tmp_path):
+        """Тест: каталог хранилища доступен только владельцу"""
+        directory = tmp_path / 'results'
+        directory.mkdir(mode=0o777)
+        os.chmod(directory, 0o777)
+        ResultStore(str(directory), 10 ** 8, 3600)
+        assert os.stat(directory).st_mode & 0o777 == 0o700
+        assert os.stat(ResultStore(str(tmp_path / 'new'), 10 ** 8, 3600).directory).st_mode & 0o777 == 0o700
@@ -0,0 +1,40 @@
+import pytest
+from app.services.role_index import RoleIndex
+
+class TestRoleIndex:
+
+    def test_split_by_prefix(self):
+        """Тест разбиения ролей по типам"""
+        index = RoleIndex(["ТУ Объект 1", "ТВ Роль 1", "ИВ Роль 3", "Без префикса", "ТУ ПС Тестовая"])
+
+        assert index.roles("TU") == ["ТУ Объект 1", "ТУ ПС Тестовая"]
+        assert index.roles("TV") == ["ТВ Роль 1"]
+        assert index.roles("IV") == ["ИВ Роль 3"]
+        assert len(index) == 4
+
+    def test_cleaned_names(self):
+        """Тест хранения очищенных названий без префикса"""
+        index = RoleIndex(["ТУ ПС Тестовая", "ТУ \"Объект\" 110 кВ"])
+        assert index.cleaned("TU") == ["Тестовая", "Объект 110"]
+
+    def test_find_similar_matches_with_index(self, matching_service):
+        """Тест поиска по готовому индексу совпадает с поиском по списку"""
+        roles_list = ["ТУ Объект Тестовый", "ТУ ПС Тестовый", "ТУ Тестовый Объект", "ТВ Другая Роль"]
+        index = RoleIndex(roles_list)
+
+        assert matching_service.find_similar_matches("Тестовый", "TU", index) == \
+            matching_service.find_similar_matches("Тестовый", "TU", roles_list)
+
+    def test_lookup_canonical(self):
+        """Тест поиска роли по каноническому ключу"""
+        index = RoleIndex(["ТУ ПС Северная 110 кВ", "ТВ Северная"])
+
+        assert index.lookup_canonical("TU", "северная  110") == "ТУ ПС Северная 110 кВ"
+        assert index.lookup_canonical("TV", "«Северная»") == "ТВ Северная"
+        assert index.lookup_canonical("IV", "Северная") is None
+        assert index.lookup_canonical("TU", "ПС") is None
+
+    def test_lookup_canonical_ambiguous(self):
+        """Тест: неоднозначный ключ не дает автоматического совпадения"""
+        index = RoleIndex(["ТУ ПС Северная", "ТУ Северная", "ТУ ПС Северная"])
+        assert index.lookup_canonical("TU", "Северная") is None
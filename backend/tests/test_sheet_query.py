@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+from app.services.sheet_query import SheetIndex
+
+def make_index():
+    return SheetIndex(pd.DataFrame({
+        'Роль': ['ТУ Северная', 'ТВ Южная', np.nan, 'ТУ Южная', 'ТВ Северная'],
+        'Номер': ['10', '9', '', '100', '1'],
+    }))
+
+class TestSheetIndex:
+
+    def test_search_case_insensitive(self):
+        """Тест поиска подстроки без учета регистра"""
+        assert make_index().query(search='южная').tolist() == [1, 3]
+        assert make_index().query(search='СЕВ', search_columns=['Номер']).tolist() == []
+
+    def test_filters_use_inverted_index(self):
+        """Тест фильтров по точному значению и списку значений"""
+        index = make_index()
+        assert index.query(filters={'Роль': 'ТУ Южная'}).tolist() == [3]
+        assert index.query(filters={'Роль': ['ТУ Южная', 'ТВ Южная', 'Нет']}).tolist() == [1, 3]
+        assert index.query(filters={'Роль': ''}).tolist() == [2]
+        assert 'Роль' in index._postings
+
+    def test_numeric_sort(self):
+        """Тест: колонка из чисел сортируется как числа, пустые значения в конце"""
+        index = make_index()
+        assert index.query(sort_by='Номер').tolist() == [4, 1, 0, 3, 2]
+        assert index.query(sort_by='Номер', descending=True, search='ту').tolist() == [3, 0]
+
+    def test_text_sort_with_filter(self):
+        """Тест текстовой сортировки вместе с фильтром"""
+        index = make_index()
+        rows = index.query(sort_by='Роль', search='северная')
+        assert rows.tolist() == [4, 0]
+
+    def test_descending_sort_is_stable_with_empties_last(self):
+        """Тест: обратная сортировка сохраняет порядок равных значений, пустые - в конце"""
+        index = SheetIndex(pd.DataFrame({
+            'Роль': ['Б', np.nan, 'А', 'Б', '', 'А'],
+            'Номер': ['2', '', '1', '2', '3', '1'],
+        }))
+        assert index.query(sort_by='Роль').tolist() == [2, 5, 0, 3, 1, 4]
+        assert index.query(sort_by='Роль', descending=True).tolist() == [0, 3, 2, 5, 1, 4]
+        assert index.query(sort_by='Номер', descending=True).tolist() == [4, 0, 3, 2, 5, 1]
@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+from app.services.workbook_cache import WorkbookCache, workbook_cache
+from app.services.excel_service import ExcelService
+
+def frame(rows):
+    return pd.DataFrame({'A': [f'значение {i}' for i in range(rows)]})
+
+class TestWorkbookCache:
+
+    def test_hits_and_misses(self):
+        """Тест счетчиков попаданий и промахов"""
+        cache = WorkbookCache(max_bytes=10 ** 7)
+        assert cache.get(('h', 'Лист1', None)) is None
+        cache.put(('h', 'Лист1', None), frame(3))
+        assert cache.get(('h', 'Лист1', None)) is not None
+
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['entries'] == 1
+
+    def test_lru_eviction_by_memory(self):
+        """Тест вытеснения давно не использованных листов при превышении бюджета"""
+        size = int(frame(100).memory_usage(index=True, deep=True).sum())
+        cache = WorkbookCache(max_bytes=size * 2)
+        cache.put('a', frame(100))
+        cache.put('b', frame(100))
+        cache.get('a')
+        cache.put('c', frame(100))
+
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        assert cache.get('c') is not None
+        assert cache.stats()['evictions'] == 1
+        assert cache.stats()['bytes'] <= size * 2
+
+    def test_oversized_frame_not_cached(self):
+        """Тест: лист больше бюджета не кэшируется"""
+        cache = WorkbookCache(max_bytes=10)
+        cache.put('a', frame(100))
+        assert cache.get('a') is None
+
+    def test_projection_served_from_full_sheet(self, sample_excel_content):
+        """Тест: колонки для анализа берутся из листа, разобранного для предпросмотра"""
+        content = sample_excel_content['roles_content']
+        full = ExcelService.load_excel_sheet(content)
+        hits = workbook_cache.stats()['hits']
+
+        projected = ExcelService.load_excel_sheet(content, columns=['UID'])
+        assert workbook_cache.stats()['hits'] == hits + 1
+        assert projected['UID'].tolist() == full['UID'].tolist()
+        assert list(projected.columns) == ['UID']
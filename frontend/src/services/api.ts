@@ -13,7 +13,8 @@ export interface FilePreviewResponse {
   sheets: { // ДОБАВЛЯЕМ НОВОЕ ПОЛЕ
     [sheetName: string]: {
       columns: string[];
-      preview_data: any[];
+      preview_data: any[]; // Только первые строки листа
+      total_rows: number;
     };
   };
 }
@@ -21,6 +22,10 @@ export interface FilePreviewResponse {
 export interface SheetDataResponse {
   columns: string[];
   preview_data: any[]; // Изменено с previewData на preview_data
+  total_rows?: number; // Число строк, подходящих под поиск/фильтры (данные отдаются постранично)
+  sheet_rows?: number; // Общее число строк листа
+  offset?: number;
+  limit?: number;
 }
 
 // АДАПТИРОВАННЫЙ ИНТЕРФЕЙС ДЛЯ ФРОНТЕНДА
@@ -40,6 +45,7 @@ export interface AnalysisRequest {
 }
 
 export interface AnalysisResponse {
+  analysis_id?: string;
   unique_tu: string[];
   unique_tv: string[];
   unique_iv: string[];
@@ -64,6 +70,24 @@ export interface AnalysisResponse {
   };
 }
 
+// Фоновая задача анализа (/api/analyze/jobs)
+export interface AnalysisJobStatus {
+  job_id: string;
+  status: 'queued' | 'running' | 'completed' | 'failed' | 'cancelled';
+  stage: string | null;
+  progress: Record<string, { done: number; total: number }>;
+  error: string | null;
+  result: AnalysisResponse | null;
+}
+
+// Запись потокового анализа (/api/analyze/stream, NDJSON)
+export type AnalysisStreamRecord =
+  | { type: 'unique_values'; unique_tu: string[]; unique_tv: string[]; unique_iv: string[] }
+  | { type: 'auto_matches'; auto_matches: AnalysisResponse['auto_matches'] }
+  | { type: 'pending_matches'; role_type: 'TU' | 'TV' | 'IV'; matches: AnalysisResponse['pending_matches']['TU'] }
+  | { type: 'summary'; unique: Record<string, number>; auto_matches: Record<string, number>;
+      pending_matches: Record<string, number>; elapsed_seconds: number };
+
 export interface ProcessRequest {
   analysis_data: any;
   user_choices: {
@@ -175,12 +199,31 @@ class ApiService {
     });
   }
 
-  // СУЩЕСТВУЮЩИЕ МЕТОДЫ (оставляем без изменений)
+  // Анализ выполняется фоновой задачей: запрос не упирается в таймауты при больших файлах
   async analyzeFiles(
     surveyFile: File,
     rolesFile: File,
-    params: AnalysisRequest
+    params: AnalysisRequest,
+    onProgress?: (job: AnalysisJobStatus) => void
   ): Promise<AnalysisResponse> {
+    let job = await this.submitAnalysisJob(surveyFile, rolesFile, params);
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      job = await this.getAnalysisJob(job.job_id);
+      onProgress?.(job);
+    }
+
+    if (job.status !== 'completed' || !job.result) {
+      throw new Error(job.error || 'Анализ отменен');
+    }
+    return job.result;
+  }
+
+  async submitAnalysisJob(
+    surveyFile: File,
+    rolesFile: File,
+    params: AnalysisRequest
+  ): Promise<AnalysisJobStatus> {
     const formData = new FormData();
     formData.append('survey_file', surveyFile);
     formData.append('roles_file', rolesFile);
@@ -190,7 +233,7 @@ class ApiService {
     formData.append('uid_col', params.uid_col);
     formData.append('replacements', JSON.stringify(params.replacements));
 
-    const response = await api.post<AnalysisResponse>('/api/analyze', formData, {
+    const response = await api.post<AnalysisJobStatus>('/api/analyze/jobs', formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
       },
@@ -198,13 +241,59 @@ class ApiService {
     return response.data;
   }
 
+  // Потоковый анализ: onRecord вызывается для каждой записи по мере готовности
+  async streamAnalysis(
+    surveyFile: File,
+    rolesFile: File,
+    params: AnalysisRequest,
+    onRecord: (record: AnalysisStreamRecord) => void
+  ): Promise<void> {
+    const formData = new FormData();
+    formData.append('survey_file', surveyFile);
+    formData.append('roles_file', rolesFile);
+    formData.append('control_col', params.control_col);
+    formData.append('operation_cols', JSON.stringify(params.operation_cols));
+    formData.append('role_col', params.role_col);
+    formData.append('uid_col', params.uid_col);
+    formData.append('replacements', JSON.stringify(params.replacements));
+
+    // axios в браузере не отдает тело по частям, поэтому fetch
+    const response = await fetch(`${API_BASE_URL}/api/analyze/stream`, { method: 'POST', body: formData });
+    if (!response.ok || !response.body) {
+      const detail = await response.json().catch(() => null);
+      throw new Error(detail?.detail || `Ошибка анализа: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      buffer += decoder.decode(value, { stream: !done });
+      const lines = buffer.split('\n');
+      buffer = lines.pop() || '';
+      lines.filter((line) => line.trim()).forEach((line) => onRecord(JSON.parse(line)));
+      if (done) break;
+    }
+  }
+
+  async getAnalysisJob(jobId: string): Promise<AnalysisJobStatus> {
+    const response = await api.get<AnalysisJobStatus>(`/api/analyze/jobs/${jobId}`);
+    return response.data;
+  }
+
+  async cancelAnalysisJob(jobId: string): Promise<AnalysisJobStatus> {
+    const response = await api.delete<AnalysisJobStatus>(`/api/analyze/jobs/${jobId}`);
+    return response.data;
+  }
+
   async processData(request: ProcessRequest): Promise<any> {
     const response = await api.post('/api/process', request);
     return response.data;
   }
 
-  async downloadResult(processId: string): Promise<Blob> {
-    const response = await api.get(`/api/download-result?process_id=${processId}`, {
+  async downloadResult(processId: string, format: 'xlsx' | 'csv' | 'parquet' = 'xlsx'): Promise<Blob> {
+    const response = await api.get(`/api/download-result?process_id=${processId}&format=${format}`, {
       responseType: 'blob',
     });
     return response.data;
@@ -14,6 +14,7 @@ export interface PendingMatch {
 }
 
 export interface AnalysisResponse {
+  analysis_id?: string;
   unique_tu: string[];
   unique_tv: string[];
   unique_iv: string[];